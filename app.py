@@ -1,12 +1,13 @@
+import hashlib
 import io
 import zipfile
 import streamlit as st
 
-from processing import load_data, clean_data, merge_data, get_regulation_groups, calculate_reference_statistics
-from plotting import create_chart
 import os
 import shutil
-import text_generation
+
+# processing, plotting and text_generation (pandas, numpy, matplotlib) are imported
+# inside the functions that use them, so the landing page renders without loading them.
 
 # --- CUSTOM FONT REGISTRATION ---
 # Attempt to register Bookman Old Style fonts if they exist
@@ -19,23 +20,33 @@ target_dirs = [
     os.path.expanduser("~/.local/share/fonts")
 ]
 
-font_registered = False
+@st.cache_resource(show_spinner=False)
+def _register_fonts():
+    """
+    Copies the fonts to the Linux font folders and refreshes the font cache.
+    Cached as a resource so it runs once per process instead of on every rerun.
+    """
+    font_registered = False
+
+    for font_dir in target_dirs:
+        if not os.path.exists(font_dir):
+            os.makedirs(font_dir, exist_ok=True)
+
+        for font_file in font_files:
+            if os.path.exists(font_file):
+                target_path = os.path.join(font_dir, font_file)
+                # Copy only if missing or outdated
+                if not os.path.exists(target_path) or os.path.getmtime(font_file) > os.path.getmtime(target_path):
+                    shutil.copy(font_file, target_path)
+                    font_registered = True
 
-for font_dir in target_dirs:
-    if not os.path.exists(font_dir):
-        os.makedirs(font_dir, exist_ok=True)
+    if font_registered:
+        # Refresh font cache (only when a font was actually copied)
+        os.system("fc-cache -f -v")
 
-    for font_file in font_files:
-        if os.path.exists(font_file):
-            target_path = os.path.join(font_dir, font_file)
-            # Always overwrite to ensure we have the right version
-            shutil.copy(font_file, target_path)
-            font_registered = True
+    return True
 
-if font_registered:
-    # Refresh font cache
-    # Try multiple commands to be safe
-    os.system("fc-cache -f -v")
+_register_fonts()
 
 # Page Configuration
 st.set_page_config(
@@ -48,6 +59,41 @@ st.set_page_config(
 if 'page' not in st.session_state:
     st.session_state['page'] = 'landing'
 
+# Configuration per module type
+_MODULE_CFG = {
+    "surface": {
+        "title": "🌊 Agua Superficial - Comparativa ECA",
+        "default_file": "bbdd_molde.xlsx",
+        "reg_defaults_filter": ["ECA 2017 3D1", "ECA 2017 3D2"],
+        "success_msg_prefix": "Agua Superficial",
+    },
+    "effluents": {
+        "title": "🏭 Efluentes - Comparativa LMP/NMP",
+        "default_file": "bbdd_molde_efluentes.xlsx",
+        "reg_defaults_filter": [], # No smart filter for effluents defined yet, or default to all
+        "success_msg_prefix": "Efluentes",
+    },
+    "sediments": {
+        "title": "⛰️ Sedimentos - Comparativa CCME",
+        "default_file": "bbdd_molde_sedimentos.xlsx",
+        "reg_defaults_filter": [], # Defaults handled later
+        "success_msg_prefix": "Sedimentos",
+    },
+    "groundwater": {
+        "title": "💧 Agua Subterránea - Análisis Estadístico",
+        "default_file": "bbdd_molde.xlsx", # Use same mold, will ignore ECA
+        "reg_defaults_filter": [],
+        "success_msg_prefix": "Agua Subterránea",
+    },
+}
+
+_DEFAULT_MODULE_CFG = {
+    "title": "Módulo Desconocido",
+    "default_file": "",
+    "reg_defaults_filter": [],
+    "success_msg_prefix": "Datos",
+}
+
 def navigate_to(page):
     st.session_state['page'] = page
 
@@ -81,6 +127,7 @@ def landing_page():
 
 def generar_paquete_descarga_total(
     df_final, 
+    param_index,
     module_type, 
     format_imagen="png", 
     selected_standards=None, 
@@ -103,6 +150,42 @@ def generar_paquete_descarga_total(
     Genera un archivo ZIP en memoria que contiene todas las gráficas y interpretaciones,
     respetando exactamente la configuración estética seleccionada por el usuario en la app.
     """
+    import text_generation
+    from processing import get_regulation_groups
+    from plotting import render_chart_image
+
+    # Columnas de normativa a dibujar: son las mismas para todos los parámetros
+    selected_cols = []
+    if module_type == "groundwater":
+        if gw_ref_options:
+            if "Promedio + 2 Desviaciones Estándar" in gw_ref_options:
+                selected_cols.append('lim_referencia_gw_sup')
+            if "Promedio - 2 Desviaciones Estándar" in gw_ref_options:
+                selected_cols.append('lim_referencia_gw_inf')
+    else:
+        reg_groups = get_regulation_groups(df_final)
+        if selected_standards:
+            for std in selected_standards:
+                if std in reg_groups:
+                    selected_cols.extend(reg_groups[std])
+
+    # Estilo de las gráficas: exactamente las variables configuradas en la interfaz
+    chart_kwargs = dict(
+        selected_columns=selected_cols,
+        date_angle=date_angle,
+        date_format=date_format,
+        x_label_count=x_label_count,
+        legend_position=legend_position,
+        symbol_style=symbol_style,
+        legend_size=legend_size,
+        legend_cols=legend_cols,
+        symbol_size=symbol_size,
+        legend_spacing=legend_spacing,
+        log_scale=log_scale,
+        custom_otros_name=custom_otros_name,
+        custom_line_styles=custom_line_styles
+    )
+
     zip_buffer = io.BytesIO()
     
     with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
@@ -111,7 +194,7 @@ def generar_paquete_descarga_total(
         
         for param in parametros:
             # 1. GENERACIÓN DEL TEXTO
-            param_group = df_final[df_final['parametro'] == param]
+            param_group = df_final.iloc[param_index[param]]
             texto_generado = ""
             try:
                 if module_type == "surface":
@@ -139,51 +222,11 @@ def generar_paquete_descarga_total(
 
             # 2. GENERACIÓN DE LA GRÁFICA CON ESTILO CORRECTO
             try:
-                selected_cols = []
-                if module_type == "groundwater":
-                    if gw_ref_options:
-                        if "Promedio + 2 Desviaciones Estándar" in gw_ref_options:
-                            selected_cols.append('lim_referencia_gw_sup')
-                        if "Promedio - 2 Desviaciones Estándar" in gw_ref_options:
-                            selected_cols.append('lim_referencia_gw_inf')
-                else:
-                    reg_groups = get_regulation_groups(df_final)
-                    if selected_standards:
-                        for std in selected_standards:
-                            if std in reg_groups:
-                                selected_cols.extend(reg_groups[std])
-                
-                # Llamamos a create_chart enviándole exactamente las variables configuradas
-                fig = create_chart(
-                    df_final, 
-                    param, 
-                    selected_columns=selected_cols,
-                    date_angle=date_angle,
-                    date_format=date_format,
-                    x_label_count=x_label_count,
-                    legend_position=legend_position,
-                    symbol_style=symbol_style,
-                    legend_size=legend_size,
-                    legend_cols=legend_cols,
-                    symbol_size=symbol_size,        
-                    legend_spacing=legend_spacing,
-                    log_scale=log_scale,
-                    custom_otros_name=custom_otros_name,
-                    custom_line_styles=custom_line_styles
-                )
-                
-                if fig:
-                    img_buffer = io.BytesIO()
-                    fig.savefig(img_buffer, format=format_imagen, dpi=300, bbox_inches='tight', pad_inches=0.1)
-                    img_buffer.seek(0)
-                    
-                    filename = f"graficos/{param}.{format_imagen}"
-                    zip_file.writestr(filename, img_buffer.getvalue())
-                    
-                    import matplotlib.pyplot as plt
-                    plt.close(fig) # Liberar memoria
-            except Exception as e:
-                pass
+                imagen = render_chart_image(param_group, param, image_format=format_imagen, dpi=300, **chart_kwargs)
+            except Exception:
+                imagen = None
+            if imagen:
+                zip_file.writestr(f"graficos/{param}.{format_imagen}", imagen)
 
         # 3. AGREGAR EL ARCHIVO TXT
         texto_final_acumulado = "".join(textos_totales)
@@ -192,38 +235,489 @@ def generar_paquete_descarga_total(
     zip_buffer.seek(0)
     return zip_buffer.getvalue()
 
+@st.cache_data(show_spinner="Procesando datos...")
+def _load_and_prepare(file_bytes, file_name):
+    """
+    Loads, cleans and merges the uploaded Excel file.
+    Cached on the file bytes + name, so widget interactions reuse the result
+    instead of re-parsing the workbook on every rerun.
+    Returns ((df_final, df_eca, param_index), None) or (None, error_message),
+    where param_index maps each parameter to its row positions in df_final.
+    """
+    import pandas as pd
+    from processing import load_data, clean_data, merge_data
+
+    data, error = load_data(io.BytesIO(file_bytes))
+    if error:
+        return None, error
+
+    df_raw, df_eca = data
+    try:
+        # Clean 'valor' column and merge with Regulations
+        df_final = merge_data(clean_data(df_raw), df_eca)
+
+        # Categorical 'parametro' (in order of appearance) + row positions per parameter,
+        # so the module can list and slice parameters without rescanning the column
+        df_final['parametro'] = pd.Categorical(df_final['parametro'], categories=df_final['parametro'].dropna().unique())
+        param_index = df_final.groupby('parametro', observed=True).indices
+        # One unit per parameter: keep it as integer codes too
+        df_final['unidad'] = df_final['unidad'].astype('category')
+    except Exception as e:
+        return None, f"Ocurrió un error durante el procesamiento: {e}"
+
+    return (df_final, df_eca, param_index), None
+
+@st.cache_data(show_spinner=False)
+def _regulation_options(columns, module_type, reg_defaults_filter):
+    """
+    Returns (reg_groups, standard_names, defaults) for the regulation multiselect.
+    Only depends on the column names, so it is cached on them instead of on the data.
+    """
+    import pandas as pd
+    from processing import get_regulation_groups
+
+    # Group regulation columns
+    reg_groups = get_regulation_groups(pd.DataFrame(columns=list(columns)))
+
+    # Create options list
+    standard_names = list(reg_groups.keys())
+
+    # Smart defaults
+    defaults = []
+    if module_type == "surface":
+        defaults = [
+            name for name in standard_names 
+            if any(f in name for f in reg_defaults_filter)
+        ]
+    else:
+        defaults = standard_names
+
+    if not defaults: 
+        defaults = standard_names
+
+    return reg_groups, standard_names, defaults
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _render_chart_images(
+    df_final,
+    parameter,
+    selected_columns=None,
+    date_angle=45,
+    date_format="MM-YY",
+    x_label_count=0,
+    legend_position="bottom",
+    symbol_style="varied",
+    legend_size=7.0,
+    legend_cols=5,
+    symbol_size=3.0,
+    legend_spacing=0.2,
+    log_scale=False,
+    custom_otros_name="Otros",
+    custom_line_styles=None,
+    image_format="png",
+    dpi=300
+):
+    """
+    Renders the chart of a parameter to image bytes ('png' or 'svg'), or None if there is no data.
+    Cached per parameter + style settings + format/dpi: switching back to an already rendered
+    chart reuses the bytes instead of drawing and encoding it again.
+    """
+    from plotting import render_chart_image
+
+    return render_chart_image(
+        df_final,
+        parameter,
+        image_format=image_format,
+        dpi=dpi,
+        selected_columns=selected_columns,
+        date_angle=date_angle,
+        date_format=date_format,
+        x_label_count=x_label_count,
+        legend_position=legend_position,
+        symbol_style=symbol_style,
+        legend_size=legend_size,
+        legend_cols=legend_cols,
+        symbol_size=symbol_size,
+        legend_spacing=legend_spacing,
+        log_scale=log_scale,
+        custom_otros_name=custom_otros_name,
+        custom_line_styles=custom_line_styles
+    )
+
+@st.fragment
+def _render_controls_and_chart(df_final, param_index, module_type, success_msg_prefix, reg_defaults_filter, gw_ref_options):
+    """
+    Renders the sidebar controls, interpretation, chart and data table of a module.
+    Runs as a fragment: changing a widget reruns only this part, not the file loading.
+    """
+    import text_generation
+
+    try:
+        # 3. Sidebar Controls
+        st.sidebar.header(f"Filtros ({success_msg_prefix})")
+        
+        # Get unique parameters
+        params = df_final['parametro'].cat.categories
+        selected_param = st.sidebar.selectbox("Seleccionar Parámetro", params)
+        
+        # Filas del parámetro seleccionado: se extraen una sola vez para el texto, el gráfico y la tabla
+        param_group = df_final.iloc[param_index[selected_param]] if selected_param else df_final.iloc[:0]
+        
+        selected_cols = []
+        
+        # --- Regulation Filtering (SKIP FOR GROUNDWATER) ---
+        if module_type != "groundwater":
+            st.sidebar.subheader("Normativas")
+            # Group regulation columns + options list + smart defaults (cached)
+            reg_groups, standard_names, defaults = _regulation_options(
+                tuple(df_final.columns), module_type, tuple(reg_defaults_filter)
+            )
+            
+            if standard_names:
+                selected_standards = st.sidebar.multiselect(
+                    "Seleccionar Normativas a visualizar",
+                    standard_names,
+                    default=defaults
+                )
+
+                # --- NUEVA LÓGICA DE INTERFAZ PARA "OTROS" ---
+                custom_otros_name = "Otros"
+                if selected_standards and "Otros" in selected_standards:
+                    custom_otros_name = st.sidebar.text_input(
+                        "Nombre para la normativa 'Otros'", 
+                        value="PIA Lauricocha",
+                        help="Este nombre aparecerá en la leyenda del gráfico y en la interpretación."
+                    )
+                # ---------------------------------------------
+                
+                selected_cols = []
+                for std in selected_standards:
+                    selected_cols.extend(reg_groups[std])
+            else:
+                selected_cols = None
+                st.sidebar.info("No se encontraron normativas en el archivo.")
+        else:
+            selected_cols = []
+            if "Promedio + 2 Desviaciones Estándar" in gw_ref_options:
+                selected_cols.append('lim_referencia_gw_sup')
+            if "Promedio - 2 Desviaciones Estándar" in gw_ref_options:
+                selected_cols.append('lim_referencia_gw_inf')
+                
+            st.sidebar.info(f"Mostrando {len(selected_cols)} niveles de referencia.")
+        
+        # --- CUSTOMIZATION CONTROLS ---
+        st.sidebar.markdown("---")
+        st.sidebar.subheader("Personalización del Gráfico")
+
+        # --- NUEVO: COLORES Y ESTILOS DE LÍNEA PERSONALIZADOS ---
+        custom_line_styles = {}
+        with st.sidebar.expander("🎨 Colores y Estilos de Normativa"):
+            if module_type != "groundwater" and selected_standards:
+                for std in selected_standards:
+                    st.markdown(f"**{std}**")
+                    # Iterate through the columns grouped under this standard
+                    for col in reg_groups[std]:
+                        # Assign friendly labels and sensible default colors
+                        if "lim_inf" in col.lower():
+                            lbl = "Lím. Inferior"
+                            def_color = "#0000FF" # Azul
+                            def_style_idx = 1     # Punteado (--)
+                        elif "lim_sup" in col.lower():
+                            lbl = "Lím. Superior"
+                            def_color = "#FF0000" # Rojo
+                            def_style_idx = 0     # Continuo (-)
+                        elif "isqg" in col.lower():
+                            lbl = "ISQG"
+                            def_color = "#800080" # Morado
+                            def_style_idx = 2     # Raya-punto (-.)
+                        elif "pel" in col.lower():
+                            lbl = "PEL"
+                            def_color = "#FF8C00" # Naranja
+                            def_style_idx = 0     # Continuo (-)
+                        else:
+                            lbl = "Límite"
+                            def_color = "#008000" # Verde
+                            def_style_idx = 0
+
+                        c1, c2 = st.columns(2)
+                        with c1:
+                            chosen_color = st.color_picker(f"Color ({lbl})", value=def_color, key=f"c_{col}")
+                        with c2:
+                            ls_opts = {"Continuo (-)": "-", "Punteado (--)": "--", "Raya-punto (-.)": "-.", "Puntos (:)": ":"}
+                            chosen_style_lbl = st.selectbox(f"Estilo ({lbl})", list(ls_opts.keys()), index=def_style_idx, key=f"s_{col}")
+                            chosen_style = ls_opts[chosen_style_lbl]
+
+                        custom_line_styles[col] = {"color": chosen_color, "linestyle": chosen_style}
+                        
+            elif module_type == "groundwater" and selected_cols:
+                st.markdown("**Valores de Referencia**")
+                for col in selected_cols:
+                    lbl = "Lím. Superior" if "sup" in col.lower() else "Lím. Inferior"
+                    def_color = "#FF0000" if "sup" in col.lower() else "#0000FF"
+                    
+                    c1, c2 = st.columns(2)
+                    with c1:
+                        chosen_color = st.color_picker(f"Color ({lbl})", value=def_color, key=f"c_{col}")
+                    with c2:
+                        ls_opts = {"Continuo (-)": "-", "Punteado (--)": "--", "Raya-punto (-.)": "-.", "Puntos (:)": ":"}
+                        chosen_style_lbl = st.selectbox(f"Estilo ({lbl})", list(ls_opts.keys()), index=1, key=f"s_{col}")
+                        chosen_style = ls_opts[chosen_style_lbl]
+                        
+                    custom_line_styles[col] = {"color": chosen_color, "linestyle": chosen_style}
+        # --------------------------------------------------------
+        
+        # Legend Position
+        legend_pos_options = {"Derecha": "right", "Abajo": "bottom"}
+        selected_legend_pos = st.sidebar.selectbox(
+            "Posición de la Leyenda",
+            options=list(legend_pos_options.keys()),
+            index=1  # <-- CAMBIADO A 1 PARA QUE EL DEFAULT SEA "Abajo"
+        )
+        
+        # Legend Font Size
+        selected_legend_size = st.sidebar.slider(
+            "Tamaño de Letra de la Leyenda",
+            min_value=4.0,
+            max_value=12.0,
+            value=7.0,
+            step=0.5,
+            help="Ajusta el tamaño del texto de la leyenda en la gráfica."
+        )
+        
+        # Separación de la Leyenda
+        selected_legend_spacing = st.sidebar.slider(
+            "Separación de líneas en Leyenda",
+            min_value=0.0,
+            max_value=1.5,
+            value=0.2,
+            step=0.1,
+            help="Controla el espacio vertical entre las líneas de la leyenda (0.2 es muy compacto)."
+        )
+        
+        # Columnas de Leyenda (Solo visible si la leyenda está abajo)
+        selected_legend_cols = 5
+        if legend_pos_options[selected_legend_pos] == "bottom":
+            selected_legend_cols = st.sidebar.number_input(
+                "Columnas de la Leyenda",
+                min_value=1,
+                max_value=10,
+                value=5,
+                step=1,
+                help="Número de columnas en las que se dividirá la leyenda."
+            )
+        
+        # Date Angle
+        angle_options = [0, 90, 45, -45, -90]
+        selected_angle = st.sidebar.selectbox(
+            "Ángulo de Etiquetas (Fechas)",
+            options=angle_options,
+            index=2  # El índice 2 corresponde a 45 grados
+        )
+        
+        # Date Format
+        date_format_options = {"Mes-Año (Ene-25)": "MM-YY", "Día-Mes-Año (23-Ene-25)": "DD-MM-YY"}
+        selected_date_format_label = st.sidebar.selectbox(
+            "Formato de Fecha (Eje X)",
+            options=list(date_format_options.keys()),
+            index=0
+        )
+        selected_date_format = date_format_options[selected_date_format_label]
+        
+        # Number of X-axis Labels (0 = Auto)
+        custom_x_labels = st.sidebar.number_input(
+            "Cantidad de Etiquetas (Eje X) (0 = Auto)",
+            min_value=0,
+            max_value=50,
+            value=0,
+            step=1,
+            help="Establece un número fijo de etiquetas en el eje X. Deja en 0 para automático."
+        )
+        
+        # Symbol Style
+        symbol_options = {"Círculo": "circle", "Variado": "varied"}
+        selected_symbol_label = st.sidebar.selectbox(
+            "Símbolos de Estaciones",
+            options=list(symbol_options.keys()),
+            index=1  # <-- CAMBIADO A 1 PARA QUE EL DEFAULT SEA "Variado"
+        )
+        selected_symbol_style = symbol_options[selected_symbol_label]
+        
+        # Tamaño de los símbolos
+        selected_symbol_size = st.sidebar.slider(
+            "Tamaño de los Símbolos",
+            min_value=1.0,
+            max_value=15.0,
+            value=3.0, 
+            step=0.5,
+            help="Ajusta el tamaño de los puntos de las estaciones en el gráfico."
+        )
+
+        #Escala logarítmica ---
+        use_log_scale = st.sidebar.checkbox(
+            "Escala logarítmica (Eje Y)",
+            value=False,
+            help="Aplica escala logarítmica al eje Y. Útil cuando los datos tienen rangos muy amplios."
+        )
+
+        # --- NUEVA SECCIÓN DE DESCARGA TOTAL (PROCESAMIENTO BAJO DEMANDA) ---
+        st.sidebar.markdown("---")
+        st.sidebar.subheader("📥 Descarga Masiva")
+        with st.sidebar.expander("Descargar Todo el Reporte"):
+            formato_img = st.sidebar.radio("Formato de las imágenes:", ["PNG", "SVG"], index=0, key="radio_masivo")
+            
+            # Inicializamos variables en el estado de la sesión para controlar la descarga
+            if "zip_descargable" not in st.session_state:
+                st.session_state["zip_descargable"] = None
+            if "modulo_procesado" not in st.session_state:
+                st.session_state["modulo_procesado"] = None
+
+            # Botón que actúa como disparador del procesamiento pesado
+            if st.button("🔄 Procesar y Generar Reportes", use_container_width=True, help="Haz clic aquí para preparar todas las gráficas con la configuración actual."):
+                with st.spinner("Generando gráficas e informes... Por favor, espera."):
+                    # Ejecutamos la función pesada SOLO ahora que se hizo clic
+                    st.session_state["zip_descargable"] = generar_paquete_descarga_total(
+                        df_final=df_final,
+                        param_index=param_index,
+                        module_type=module_type,
+                        format_imagen=formato_img.lower(),
+                        selected_standards=selected_standards if 'selected_standards' in locals() else None,
+                        gw_ref_options=gw_ref_options if 'gw_ref_options' in locals() else None,
+                        custom_otros_name=custom_otros_name if 'custom_otros_name' in locals() else "Otros",
+                        date_angle=selected_angle,
+                        date_format=selected_date_format,
+                        x_label_count=custom_x_labels,
+                        legend_position=legend_pos_options[selected_legend_pos],
+                        symbol_style=selected_symbol_style,
+                        legend_size=selected_legend_size,
+                        legend_cols=selected_legend_cols if 'selected_legend_cols' in locals() else 5,
+                        symbol_size=selected_symbol_size,
+                        legend_spacing=selected_legend_spacing,
+                        log_scale=use_log_scale,
+                        custom_line_styles=custom_line_styles if 'custom_line_styles' in locals() else None
+                    )
+                    st.session_state["modulo_procesado"] = module_type
+                    st.success("¡Reportes listos para descargar!")
+
+            # Si el ZIP ya fue generado y pertenece al módulo actual, mostramos el botón de descarga real
+            if st.session_state["zip_descargable"] is not None and st.session_state["modulo_procesado"] == module_type:
+                st.download_button(
+                    label=f"💾 Descargar ZIP ({formato_img})",
+                    data=st.session_state["zip_descargable"],
+                    file_name=f"reporte_{success_msg_prefix.lower().replace(' ', '_')}.zip",
+                    mime="application/zip",
+                    use_container_width=True
+                )
+                
+                # Opción para limpiar el buffer si el usuario quiere volver a procesar tras hacer cambios
+                if st.button("🧹 Limpiar descarga", use_container_width=True):
+                    st.session_state["zip_descargable"] = None
+                    st.session_state["modulo_procesado"] = None
+                    st.rerun()
+                   
+        # --- GENERAR TEXTO ---
+        if selected_param:
+            st.markdown("### Interpretación")
+            try:
+                texto_generado = ""
+        
+                if module_type == "surface":
+                    texto_generado = text_generation.generar_texto_superficial(
+                        param_group, selected_standards, custom_otros_name
+                    )
+        
+                elif module_type == "effluents":
+                    texto_generado = text_generation.generar_texto_efluentes(
+                        param_group, selected_standards
+                    )
+        
+                elif module_type == "sediments":
+                    texto_generado = text_generation.generar_texto_sedimentos(
+                        param_group, selected_standards
+                    )
+        
+                elif module_type == "groundwater":
+                    calc_alto = "Promedio + 2 Desviaciones Estándar" in gw_ref_options
+                    calc_bajo = "Promedio - 2 Desviaciones Estándar" in gw_ref_options
+                    texto_generado = text_generation.generar_texto_subterranea(
+                        param_group, calc_ref_alto=calc_alto, calc_ref_bajo=calc_bajo
+                    )
+        
+                st.write(texto_generado)
+            except Exception as e:
+                st.error(f"Ocurrió un error al generar el texto: {e}")
+
+        # 4. Visualization
+        if selected_param:
+            chart_kwargs = dict(
+                selected_columns=tuple(selected_cols) if selected_cols is not None else None,
+                date_angle=selected_angle,
+                date_format=selected_date_format,
+                x_label_count=custom_x_labels,
+                legend_position=legend_pos_options[selected_legend_pos],
+                symbol_style=selected_symbol_style,
+                legend_size=selected_legend_size,
+                legend_cols=selected_legend_cols,
+                symbol_size=selected_symbol_size,
+                legend_spacing=selected_legend_spacing,
+                log_scale=use_log_scale,
+                custom_otros_name=custom_otros_name if 'custom_otros_name' in locals() else "Otros",
+                custom_line_styles=custom_line_styles
+            )
+            
+            # Vista previa a 200 dpi (nítida en pantalla, ~55 % menos píxeles que 300 dpi).
+            # Cacheado por parámetro + configuración estética + formato/dpi.
+            preview_png = _render_chart_images(param_group, selected_param, image_format="png", dpi=200, **chart_kwargs)
+            
+            if preview_png:
+                st.image(preview_png, caption=f"Gráfico Generado: {selected_param}")
+                
+                # Mostrar botones de descarga en columnas
+                col_down1, col_down2 = st.columns(2)
+                
+                with col_down1:
+                    st.download_button(
+                        label="📸 Descargar Imagen (PNG)",
+                        # PNG a 300 dpi y SVG: se generan solo al hacer clic en descargar
+                        data=lambda: _render_chart_images(param_group, selected_param, image_format="png", dpi=300, **chart_kwargs),
+                        file_name=f"{selected_param}.png",
+                        mime="image/png",
+                        use_container_width=True
+                    )
+                    
+                with col_down2:
+                    st.download_button(
+                        label="🖼️ Descargar Vector (SVG)",
+                        data=lambda: _render_chart_images(param_group, selected_param, image_format="svg", dpi=300, **chart_kwargs),
+                        file_name=f"{selected_param}.svg",
+                        mime="image/svg+xml",
+                        use_container_width=True
+                    )
+            else:
+                st.warning("No hay datos para graficar con este parámetro.")
+                
+        # 5. Data Table
+        # Un expander serializa su contenido aunque esté cerrado; con el toggle
+        # la tabla solo se envía al navegador cuando el usuario la pide.
+        if st.toggle("Ver Datos Detallados", key="show_table"):
+            st.dataframe(param_group)
+
+    except Exception as e:
+        st.error(f"Ocurrió un error durante el procesamiento: {e}")
+        st.exception(e)
+
 def water_quality_module(module_type="surface"):
     """
     Generic function to render the water quality module.
     module_type: 'surface' or 'effluents'
     """
+    from processing import calculate_reference_statistics_by_parameter
     
     # Configuration based on module type
-    if module_type == "surface":
-        title = "🌊 Agua Superficial - Comparativa ECA"
-        default_file = "bbdd_molde.xlsx"
-        reg_defaults_filter = ["ECA 2017 3D1", "ECA 2017 3D2"]
-        success_msg_prefix = "Agua Superficial"
-    elif module_type == "effluents":
-        title = "🏭 Efluentes - Comparativa LMP/NMP"
-        default_file = "bbdd_molde_efluentes.xlsx"
-        reg_defaults_filter = [] # No smart filter for effluents defined yet, or default to all
-        success_msg_prefix = "Efluentes"
-    elif module_type == "sediments":
-        title = "⛰️ Sedimentos - Comparativa CCME"
-        default_file = "bbdd_molde_sedimentos.xlsx"
-        reg_defaults_filter = [] # Defaults handled later
-        success_msg_prefix = "Sedimentos"
-    elif module_type == "groundwater":
-        title = "💧 Agua Subterránea - Análisis Estadístico"
-        default_file = "bbdd_molde.xlsx" # Use same mold, will ignore ECA
-        reg_defaults_filter = [] 
-        success_msg_prefix = "Agua Subterránea"
-    else:
-        title = "Módulo Desconocido"
-        default_file = ""
-        reg_defaults_filter = []
-        success_msg_prefix = "Datos"
+    cfg = _MODULE_CFG.get(module_type, _DEFAULT_MODULE_CFG)
+    title = cfg["title"]
+    default_file = cfg["default_file"]
+    reg_defaults_filter = cfg["reg_defaults_filter"]
+    success_msg_prefix = cfg["success_msg_prefix"]
 
     # Navigation Back Button
     if st.button("⬅️ Volver al Inicio"):
@@ -273,408 +767,53 @@ def water_quality_module(module_type="surface"):
             uploaded_file = default_file
             
     if uploaded_file:
-        with st.spinner('Procesando datos...'):
-            # 1. Load Data
-            (df_raw, df_eca), error = load_data(uploaded_file)
-            
-            if error:
-                st.error(error)
-            else:
-                # 2. Process Data
-                try:
-                    # Clean 'valor' column
-                    df_clean = clean_data(df_raw)
-                    
-                    # Merge with Regulations
-                    df_final = merge_data(df_clean, df_eca)
-
-                    # --- GROUNDWATER SPECIFIC LOGIC ---
-                    if module_type == "groundwater":
-                        # Calculate Reference Statistics per Parameter
-                        df_final['lim_referencia_gw_sup'] = None
-                        df_final['lim_referencia_gw_inf'] = None
-                        
-                        for param in df_final['parametro'].unique():
-                            mask = df_final['parametro'] == param
-                            subset = df_final[mask]
-                            
-                            ref_val_sup = calculate_reference_statistics(subset, method='mean_plus_2std')
-                            ref_val_inf = calculate_reference_statistics(subset, method='mean_minus_2std')
-                            
-                            df_final.loc[mask, 'lim_referencia_gw_sup'] = ref_val_sup
-                            df_final.loc[mask, 'lim_referencia_gw_inf'] = ref_val_inf
-                    
-                    st.success(f"Archivo de {success_msg_prefix} cargado con éxito. {len(df_final)} registros procesados.")
-                    
-                    # 3. Sidebar Controls
-                    st.sidebar.header(f"Filtros ({success_msg_prefix})")
-                    
-                    # Get unique parameters
-                    params = df_final['parametro'].unique()
-                    selected_param = st.sidebar.selectbox("Seleccionar Parámetro", params)
-                    
-                    selected_cols = []
-                    
-                    # --- Regulation Filtering (SKIP FOR GROUNDWATER) ---
-                    if module_type != "groundwater":
-                        st.sidebar.subheader("Normativas")
-                        # Group regulation columns
-                        reg_groups = get_regulation_groups(df_final)
-                        
-                        # Create options list
-                        standard_names = list(reg_groups.keys())
-                        
-                        if standard_names:
-                            # Smart defaults
-                            defaults = []
-                            if module_type == "surface":
-                                defaults = [
-                                    name for name in standard_names 
-                                    if any(f in name for f in reg_defaults_filter)
-                                ]
-                            else:
-                                defaults = standard_names
-
-                            if not defaults: 
-                                defaults = standard_names
-
-                            selected_standards = st.sidebar.multiselect(
-                                "Seleccionar Normativas a visualizar",
-                                standard_names,
-                                default=defaults
-                            )
-
-                            # --- NUEVA LÓGICA DE INTERFAZ PARA "OTROS" ---
-                            custom_otros_name = "Otros"
-                            if selected_standards and "Otros" in selected_standards:
-                                custom_otros_name = st.sidebar.text_input(
-                                    "Nombre para la normativa 'Otros'", 
-                                    value="PIA Lauricocha",
-                                    help="Este nombre aparecerá en la leyenda del gráfico y en la interpretación."
-                                )
-                            # ---------------------------------------------
-                            
-                            selected_cols = []
-                            for std in selected_standards:
-                                selected_cols.extend(reg_groups[std])
-                        else:
-                            selected_cols = None
-                            st.sidebar.info("No se encontraron normativas en el archivo.")
-                    else:
-                        selected_cols = []
-                        if "Promedio + 2 Desviaciones Estándar" in gw_ref_options:
-                            selected_cols.append('lim_referencia_gw_sup')
-                        if "Promedio - 2 Desviaciones Estándar" in gw_ref_options:
-                            selected_cols.append('lim_referencia_gw_inf')
-                            
-                        st.sidebar.info(f"Mostrando {len(selected_cols)} niveles de referencia.")
-                    
-                    # --- CUSTOMIZATION CONTROLS ---
-                    st.sidebar.markdown("---")
-                    st.sidebar.subheader("Personalización del Gráfico")
-
-                    # --- NUEVO: COLORES Y ESTILOS DE LÍNEA PERSONALIZADOS ---
-                    custom_line_styles = {}
-                    with st.sidebar.expander("🎨 Colores y Estilos de Normativa"):
-                        if module_type != "groundwater" and selected_standards:
-                            for std in selected_standards:
-                                st.markdown(f"**{std}**")
-                                # Iterate through the columns grouped under this standard
-                                for col in reg_groups[std]:
-                                    # Assign friendly labels and sensible default colors
-                                    if "lim_inf" in col.lower():
-                                        lbl = "Lím. Inferior"
-                                        def_color = "#0000FF" # Azul
-                                        def_style_idx = 1     # Punteado (--)
-                                    elif "lim_sup" in col.lower():
-                                        lbl = "Lím. Superior"
-                                        def_color = "#FF0000" # Rojo
-                                        def_style_idx = 0     # Continuo (-)
-                                    elif "isqg" in col.lower():
-                                        lbl = "ISQG"
-                                        def_color = "#800080" # Morado
-                                        def_style_idx = 2     # Raya-punto (-.)
-                                    elif "pel" in col.lower():
-                                        lbl = "PEL"
-                                        def_color = "#FF8C00" # Naranja
-                                        def_style_idx = 0     # Continuo (-)
-                                    else:
-                                        lbl = "Límite"
-                                        def_color = "#008000" # Verde
-                                        def_style_idx = 0
-
-                                    c1, c2 = st.columns(2)
-                                    with c1:
-                                        chosen_color = st.color_picker(f"Color ({lbl})", value=def_color, key=f"c_{col}")
-                                    with c2:
-                                        ls_opts = {"Continuo (-)": "-", "Punteado (--)": "--", "Raya-punto (-.)": "-.", "Puntos (:)": ":"}
-                                        chosen_style_lbl = st.selectbox(f"Estilo ({lbl})", list(ls_opts.keys()), index=def_style_idx, key=f"s_{col}")
-                                        chosen_style = ls_opts[chosen_style_lbl]
-
-                                    custom_line_styles[col] = {"color": chosen_color, "linestyle": chosen_style}
-                                    
-                        elif module_type == "groundwater" and selected_cols:
-                            st.markdown("**Valores de Referencia**")
-                            for col in selected_cols:
-                                lbl = "Lím. Superior" if "sup" in col.lower() else "Lím. Inferior"
-                                def_color = "#FF0000" if "sup" in col.lower() else "#0000FF"
-                                
-                                c1, c2 = st.columns(2)
-                                with c1:
-                                    chosen_color = st.color_picker(f"Color ({lbl})", value=def_color, key=f"c_{col}")
-                                with c2:
-                                    ls_opts = {"Continuo (-)": "-", "Punteado (--)": "--", "Raya-punto (-.)": "-.", "Puntos (:)": ":"}
-                                    chosen_style_lbl = st.selectbox(f"Estilo ({lbl})", list(ls_opts.keys()), index=1, key=f"s_{col}")
-                                    chosen_style = ls_opts[chosen_style_lbl]
-                                    
-                                custom_line_styles[col] = {"color": chosen_color, "linestyle": chosen_style}
-                    # --------------------------------------------------------
-                    
-                    # Legend Position
-                    legend_pos_options = {"Derecha": "right", "Abajo": "bottom"}
-                    selected_legend_pos = st.sidebar.selectbox(
-                        "Posición de la Leyenda",
-                        options=list(legend_pos_options.keys()),
-                        index=1  # <-- CAMBIADO A 1 PARA QUE EL DEFAULT SEA "Abajo"
-                    )
-                    
-                    # Legend Font Size
-                    selected_legend_size = st.sidebar.slider(
-                        "Tamaño de Letra de la Leyenda",
-                        min_value=4.0,
-                        max_value=12.0,
-                        value=7.0,
-                        step=0.5,
-                        help="Ajusta el tamaño del texto de la leyenda en la gráfica."
-                    )
-                    
-                    # Separación de la Leyenda
-                    selected_legend_spacing = st.sidebar.slider(
-                        "Separación de líneas en Leyenda",
-                        min_value=0.0,
-                        max_value=1.5,
-                        value=0.2,
-                        step=0.1,
-                        help="Controla el espacio vertical entre las líneas de la leyenda (0.2 es muy compacto)."
-                    )
-                    
-                    # Columnas de Leyenda (Solo visible si la leyenda está abajo)
-                    selected_legend_cols = 5
-                    if legend_pos_options[selected_legend_pos] == "bottom":
-                        selected_legend_cols = st.sidebar.number_input(
-                            "Columnas de la Leyenda",
-                            min_value=1,
-                            max_value=10,
-                            value=5,
-                            step=1,
-                            help="Número de columnas en las que se dividirá la leyenda."
-                        )
-                    
-                    # Date Angle
-                    angle_options = [0, 90, 45, -45, -90]
-                    selected_angle = st.sidebar.selectbox(
-                        "Ángulo de Etiquetas (Fechas)",
-                        options=angle_options,
-                        index=2  # El índice 2 corresponde a 45 grados
-                    )
-                    
-                    # Date Format
-                    date_format_options = {"Mes-Año (Ene-25)": "MM-YY", "Día-Mes-Año (23-Ene-25)": "DD-MM-YY"}
-                    selected_date_format_label = st.sidebar.selectbox(
-                        "Formato de Fecha (Eje X)",
-                        options=list(date_format_options.keys()),
-                        index=0
-                    )
-                    selected_date_format = date_format_options[selected_date_format_label]
-                    
-                    # Number of X-axis Labels (0 = Auto)
-                    custom_x_labels = st.sidebar.number_input(
-                        "Cantidad de Etiquetas (Eje X) (0 = Auto)",
-                        min_value=0,
-                        max_value=50,
-                        value=0,
-                        step=1,
-                        help="Establece un número fijo de etiquetas en el eje X. Deja en 0 para automático."
-                    )
-                    
-                    # Symbol Style
-                    symbol_options = {"Círculo": "circle", "Variado": "varied"}
-                    selected_symbol_label = st.sidebar.selectbox(
-                        "Símbolos de Estaciones",
-                        options=list(symbol_options.keys()),
-                        index=1  # <-- CAMBIADO A 1 PARA QUE EL DEFAULT SEA "Variado"
-                    )
-                    selected_symbol_style = symbol_options[selected_symbol_label]
-                    
-                    # Tamaño de los símbolos
-                    selected_symbol_size = st.sidebar.slider(
-                        "Tamaño de los Símbolos",
-                        min_value=1.0,
-                        max_value=15.0,
-                        value=3.0, 
-                        step=0.5,
-                        help="Ajusta el tamaño de los puntos de las estaciones en el gráfico."
-                    )
-
-                    #Escala logarítmica ---
-                    use_log_scale = st.sidebar.checkbox(
-                        "Escala logarítmica (Eje Y)",
-                        value=False,
-                        help="Aplica escala logarítmica al eje Y. Útil cuando los datos tienen rangos muy amplios."
-                    )
+        # Los bytes y el nombre del archivo son la clave del caché
+        if isinstance(uploaded_file, str):
+            with open(uploaded_file, "rb") as f:
+                file_bytes = f.read()
+            file_name = uploaded_file
+        else:
+            file_bytes = uploaded_file.getvalue()
+            file_name = uploaded_file.name
+
+        # 1. Load Data + 2. Process Data (solo se recalcula si cambia el archivo)
+        # El resultado se guarda en la sesión junto con el hash del archivo: mientras no
+        # cambie, las interacciones reutilizan el mismo DataFrame sin pasar por el caché.
+        file_hash = hashlib.blake2b(file_bytes, digest_size=16).digest()
+        session_key = f"datos_{module_type}"
+        cached = st.session_state.get(session_key)
+        from_session = cached is not None and cached[0] == file_hash
+        if from_session:
+            data, error = cached[1]
+        else:
+            data, error = _load_and_prepare(file_bytes, file_name)
+            st.session_state[session_key] = (file_hash, (data, error))
+
+        if error:
+            st.error(error)
+        else:
+            try:
+                df_final, df_eca, param_index = data
 
-                    # --- NUEVA SECCIÓN DE DESCARGA TOTAL (PROCESAMIENTO BAJO DEMANDA) ---
-                    st.sidebar.markdown("---")
-                    st.sidebar.subheader("📥 Descarga Masiva")
-                    with st.sidebar.expander("Descargar Todo el Reporte"):
-                        formato_img = st.sidebar.radio("Formato de las imágenes:", ["PNG", "SVG"], index=0, key="radio_masivo")
-                        
-                        # Inicializamos variables en el estado de la sesión para controlar la descarga
-                        if "zip_descargable" not in st.session_state:
-                            st.session_state["zip_descargable"] = None
-                        if "modulo_procesado" not in st.session_state:
-                            st.session_state["modulo_procesado"] = None
-
-                        # Botón que actúa como disparador del procesamiento pesado
-                        if st.button("🔄 Procesar y Generar Reportes", use_container_width=True, help="Haz clic aquí para preparar todas las gráficas con la configuración actual."):
-                            with st.spinner("Generando gráficas e informes... Por favor, espera."):
-                                # Ejecutamos la función pesada SOLO ahora que se hizo clic
-                                st.session_state["zip_descargable"] = generar_paquete_descarga_total(
-                                    df_final=df_final,
-                                    module_type=module_type,
-                                    format_imagen=formato_img.lower(),
-                                    selected_standards=selected_standards if 'selected_standards' in locals() else None,
-                                    gw_ref_options=gw_ref_options if 'gw_ref_options' in locals() else None,
-                                    custom_otros_name=custom_otros_name if 'custom_otros_name' in locals() else "Otros",
-                                    date_angle=selected_angle,
-                                    date_format=selected_date_format,
-                                    x_label_count=custom_x_labels,
-                                    legend_position=legend_pos_options[selected_legend_pos],
-                                    symbol_style=selected_symbol_style,
-                                    legend_size=selected_legend_size,
-                                    legend_cols=selected_legend_cols if 'selected_legend_cols' in locals() else 5,
-                                    symbol_size=selected_symbol_size,
-                                    legend_spacing=selected_legend_spacing,
-                                    log_scale=use_log_scale,
-                                    custom_line_styles=custom_line_styles if 'custom_line_styles' in locals() else None
-                                )
-                                st.session_state["modulo_procesado"] = module_type
-                                st.success("¡Reportes listos para descargar!")
-
-                        # Si el ZIP ya fue generado y pertenece al módulo actual, mostramos el botón de descarga real
-                        if st.session_state["zip_descargable"] is not None and st.session_state["modulo_procesado"] == module_type:
-                            st.download_button(
-                                label=f"💾 Descargar ZIP ({formato_img})",
-                                data=st.session_state["zip_descargable"],
-                                file_name=f"reporte_{success_msg_prefix.lower().replace(' ', '_')}.zip",
-                                mime="application/zip",
-                                use_container_width=True
-                            )
-                            
-                            # Opción para limpiar el buffer si el usuario quiere volver a procesar tras hacer cambios
-                            if st.button("🧹 Limpiar descarga", use_container_width=True):
-                                st.session_state["zip_descargable"] = None
-                                st.session_state["modulo_procesado"] = None
-                                st.rerun()
-                               
-                    # --- GENERAR TEXTO ---
-                    if selected_param:
-                        st.markdown("### Interpretación")
-                        try:
-                            param_group = df_final[df_final['parametro'] == selected_param]
-                            texto_generado = ""
-                    
-                            if module_type == "surface":
-                                texto_generado = text_generation.generar_texto_superficial(
-                                    param_group, selected_standards, custom_otros_name
-                                )
-                    
-                            elif module_type == "effluents":
-                                texto_generado = text_generation.generar_texto_efluentes(
-                                    param_group, selected_standards
-                                )
-                    
-                            elif module_type == "sediments":
-                                texto_generado = text_generation.generar_texto_sedimentos(
-                                    param_group, selected_standards
-                                )
-                    
-                            elif module_type == "groundwater":
-                                calc_alto = "Promedio + 2 Desviaciones Estándar" in gw_ref_options
-                                calc_bajo = "Promedio - 2 Desviaciones Estándar" in gw_ref_options
-                                texto_generado = text_generation.generar_texto_subterranea(
-                                    param_group, calc_ref_alto=calc_alto, calc_ref_bajo=calc_bajo
-                                )
-                    
-                            st.write(texto_generado)
-                        except Exception as e:
-                            st.error(f"Ocurrió un error al generar el texto: {e}")
-
-                    # 4. Visualization
-                    if selected_param:
-                        fig = create_chart(
-                            df_final, 
-                            selected_param, 
-                            selected_columns=selected_cols,
-                            date_angle=selected_angle,
-                            date_format=selected_date_format,
-                            x_label_count=custom_x_labels,
-                            legend_position=legend_pos_options[selected_legend_pos],
-                            symbol_style=selected_symbol_style,
-                            legend_size=selected_legend_size,
-                            legend_cols=selected_legend_cols,
-                            symbol_size=selected_symbol_size,        
-                            legend_spacing=selected_legend_spacing,
-                            log_scale=use_log_scale,
-                            custom_otros_name=custom_otros_name if 'custom_otros_name' in locals() else "Otros",
-                            custom_line_styles=custom_line_styles
-                        )
-                        
-                        if fig:
-                            import io
-                            
-                            # Generar buffer PNG
-                            buf_png = io.BytesIO()
-                            fig.savefig(buf_png, format="png", dpi=300, bbox_inches='tight', pad_inches=0.1)
-                            buf_png.seek(0)
-                            
-                            # Generar buffer SVG
-                            buf_svg = io.BytesIO()
-                            fig.savefig(buf_svg, format="svg", bbox_inches='tight', pad_inches=0.1)
-                            buf_svg.seek(0)
-                            
-                            st.image(buf_png, caption=f"Gráfico Generado: {selected_param}", output_format="PNG")
-                            
-                            # Mostrar botones de descarga en columnas
-                            col_down1, col_down2 = st.columns(2)
-                            
-                            with col_down1:
-                                st.download_button(
-                                    label="📸 Descargar Imagen (PNG)",
-                                    data=buf_png.getvalue(),
-                                    file_name=f"{selected_param}.png",
-                                    mime="image/png",
-                                    use_container_width=True
-                                )
-                                
-                            with col_down2:
-                                st.download_button(
-                                    label="🖼️ Descargar Vector (SVG)",
-                                    data=buf_svg.getvalue(),
-                                    file_name=f"{selected_param}.svg",
-                                    mime="image/svg+xml",
-                                    use_container_width=True
-                                )
-                        else:
-                            st.warning("No hay datos para graficar con este parámetro.")
-                            
-                    # 5. Data Table
-                    with st.expander("Ver Datos Detallados"):
-                        st.dataframe(df_final[df_final['parametro'] == selected_param])
-                        
-                except Exception as e:
-                    st.error(f"Ocurrió un error durante el procesamiento: {e}")
-                    st.exception(e)
+                # --- GROUNDWATER SPECIFIC LOGIC ---
+                if module_type == "groundwater":
+                    # Calculate Reference Statistics per Parameter (single groupby pass)
+                    df_final['lim_referencia_gw_sup'], df_final['lim_referencia_gw_inf'] = calculate_reference_statistics_by_parameter(df_final)
+                
+                # Mensaje completo solo al procesar el archivo; en las siguientes ejecuciones, una nota discreta
+                if from_session:
+                    st.caption(f"Datos en caché: {len(df_final)} registros de {success_msg_prefix}.")
+                else:
+                    st.success(f"Archivo de {success_msg_prefix} cargado con éxito. {len(df_final)} registros procesados.")
+                
+                # 3-5. Sidebar controls, interpretation, chart and data table
+                _render_controls_and_chart(
+                    df_final, param_index, module_type, success_msg_prefix, reg_defaults_filter, gw_ref_options
+                )
+                
+            except Exception as e:
+                st.error(f"Ocurrió un error durante el procesamiento: {e}")
+                st.exception(e)
 
 # --- MAIN ROUTER ---
 
@@ -2,8 +2,12 @@ import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import matplotlib.font_manager as font_manager
 import matplotlib.ticker as ticker
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
 import pandas as pd
 import os
+import io
+import functools
 
 # --- REGISTRO DIRECTO DE FUENTES PARA MATPLOTLIB ---
 font_files = ["BOOKOS.TTF", "BOOKOSB.TTF", "BOOKOSI.TTF", "BOOKOSBI.TTF", "BookmanOldStyle.ttf"]
@@ -18,163 +22,192 @@ for font_file in font_files:
         except Exception:
             pass
 
+# --- CONFIGURACIÓN GLOBAL DE FUENTES ---
+# Constante a nivel de módulo: create_chart la aplica con un solo rcParams.update()
+BASE_RC_PARAMS = {
+    'font.family': custom_font_name,
+    'font.size': 9,
+    # NUEVO: Obligar al texto matemático a usar la fuente normal (Bookman Old Style)
+    'mathtext.fontset': 'custom',
+    'mathtext.bf': f'{custom_font_name}:bold',
+    'mathtext.bfit': f'{custom_font_name}:bold:italic',  # <-- clave
+    'mathtext.it': f'{custom_font_name}:italic',
+    'mathtext.rm': custom_font_name,
+    'axes.edgecolor': 'black',
+    'axes.linewidth': 1.0,
+    'axes.spines.top': True,
+    'axes.spines.right': True,
+    'axes.spines.bottom': True,
+    'axes.spines.left': True,
+}
+if custom_font_name == 'serif':
+    BASE_RC_PARAMS['font.serif'] = ['Bookman Old Style', 'Times New Roman', 'serif']
+
+# --- DICCIONARIO DE FORMAS Y COLORES ---
+MARKER_CONFIGS = [
+    ('o', True),  ('s', True),  ('D', True),  ('^', True),  ('p', True),
+    ('h', True),  ('*', True),  ('v', True),  ('<', True),  ('>', True), 
+    ('X', True),  ('d', True),  ('P', True),  ('H', True),  ('8', True),
+    
+    ('o', False), ('s', False), ('D', False), ('^', False), ('p', False),
+    ('h', False), ('*', False), ('v', False), ('<', False), ('>', False),
+    ('X', False), ('d', False), ('P', False), ('H', False), ('8', False),
+    
+    ('+', True),  ('x', True),  ('|', True),  ('_', True),  ('1', True),
+    ('2', True),  ('3', True),  ('4', True)
+]
+
+STATION_COLORS = [
+    '#e6194b', '#3cb44b', '#ffe119', '#4363d8', '#f58231', 
+    '#911eb4', '#42d4f4', '#f032e6', '#7fff00', '#fabed4', 
+    '#469990', '#dcbeff', '#9a6324', '#4b0082', '#800000', 
+    '#aaffc3', '#808000', '#ffd8b1', '#000075', '#a9a9a9', 
+    '#333333', '#ffd700', '#ff7f50', '#87ceeb', '#a87858', 
+    '#ff69b4', '#dda0dd', '#40e0d0', '#d2691e', '#4682b4', 
+    '#7fff00', '#4b0082', '#04bbfc'
+]
+
+SPANISH_MONTHS = {1: 'Ene', 2: 'Feb', 3: 'Mar', 4: 'Abr', 5: 'May', 6: 'Jun', 7: 'Jul', 8: 'Ago', 9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dic'}
+
+# A partir de esta cantidad de puntos, los marcadores de las estaciones se rasterizan
+# en la salida vectorial (SVG) en lugar de crear un elemento por punto.
+MAX_VECTOR_POINTS = 5000
+
+# Etiqueta de leyenda de cada columna de normativa. Es una función pura del nombre de
+# columna, así que se memoiza: cada columna se traduce una sola vez y no en cada gráfico.
+@functools.lru_cache(maxsize=512)
+def get_legend_label(col_name, single_line=True, custom_otros_name="Otros"):
+    if 'lim_inf_' in col_name:
+        prefix, clean_col = ("L.inf." if single_line else "Lím. inf."), col_name.replace('lim_inf_', '')
+    elif 'lim_sup_' in col_name:
+        prefix, clean_col = ("L.sup." if single_line else "Lím. sup."), col_name.replace('lim_sup_', '')
+    else:
+        prefix, clean_col = ("L." if single_line else "Lím."), col_name.replace('lim_', '')
+        
+    parts = clean_col.split('_')
+    
+    if parts[0] == 'lga':
+        reg_body, category = "LGA", (f"C.{parts[1]}" if single_line else f"Cat. {parts[1]}")
+    elif parts[0] == 'eca':
+        year, cat_raw = parts[1], "_".join(parts[2:])
+        reg_body = f"ECA-{year[-2:]}" if single_line else f"ECA-{year}"
+        suffix_desc = " costa y sierra" if cat_raw.endswith("_cys") else (" selva" if cat_raw.endswith("_s") else (" estuario" if cat_raw.endswith("_e") else (" mar" if cat_raw.endswith("_m") else "")))
+        for suffix in ["_cys", "_s", "_e", "_m"]:
+            cat_raw = cat_raw.replace(suffix, "")
+        
+        if len(cat_raw) >= 3 and cat_raw[0].isdigit():
+            code = f"{cat_raw[0]}-{cat_raw[1:].upper()}"
+            category = f"{code}{suffix_desc}" if single_line else f"Cat. {code}{suffix_desc}"
+        else:
+            category = f"{cat_raw.upper()}{suffix_desc}" if single_line else f"Cat. {cat_raw.upper()}{suffix_desc}"
+    elif parts[0] == 'nmp':
+        reg_body, category = "NMP", ("Min-96" if single_line else " ".join(parts[1:]).replace("_", " ").lower())
+    elif parts[0] == 'lmp':
+        reg_body = f"LMP-{parts[1][-2:]}" if single_line else f"LMP {parts[1]}"
+        category = "Dom" if "domestico" in col_name else ("Min" if "minero" in col_name else " ".join(parts[2:]).replace("_", " ").lower())
+    elif 'ISQG' in col_name or 'PEL' in col_name:
+        reg_body = parts[0]
+        category = "Fresh" if "freshwater" in col_name else ("Mar" if "marine" in col_name else " ".join(parts[1:]).capitalize())
+        return f"{reg_body} {category}" if single_line else f"{reg_body}\n{category}"
+    elif 'referencia_gw' in col_name:
+        reg_body = "Valor Referencial"
+        category = "Promedio + 2 Desv. Est." if 'sup' in col_name else "Promedio - 2 Desv. Est."
+        return "Ref. Prom+2DE" if single_line and 'sup' in col_name else ("Ref. Prom-2DE" if single_line else f"{reg_body}\n{category}")
+    # NUEVA REGLA PARA OTROS
+    elif 'otros' in clean_col.lower():
+        reg_body = custom_otros_name
+        return f"{prefix} {reg_body}"
+    else:
+        reg_body, category = parts[0].upper(), " ".join(parts[1:]).upper()
+
+    separator = " " if single_line else "\n"
+    return f"{prefix} {reg_body}{separator}{category}"
+
+# --- ESTILO DE LAS LÍNEAS DE NORMATIVA ---
+# Reglas en orden de prioridad: (textos a buscar en la columna, función -> (color, estilo de línea)).
+# Gana la primera regla con alguno de sus textos en el nombre de la columna (en minúsculas).
+LIMIT_STYLE_RULES = [
+    (('eca_2017_3d2',),                lambda c: ('blue', '--' if 'lim_inf' in c else '-')),
+    (('eca_2017',),                    lambda c: ('red', '-' if 'lim_inf' in c else '--')),
+    (('lga', 'eca_2008', 'eca_2015'),  lambda c: ('blue' if 'eca_2015_3d2' in c else 'green', ':' if 'lim_inf' in c else '-.')),
+    (('nmp_minero',),                  lambda c: ('purple', '-.' if 'lim_inf' in c else ':')),
+    (('lmp_2010',),                    lambda c: ('green', ':' if 'lim_inf' in c else '-') if 'domestico' in c else ('red', '-' if 'lim_inf' in c else '--')),
+    (('isqg',),                        lambda c: ('purple', '-.')),
+    (('pel',),                         lambda c: ('red', '-.')),
+    (('referencia_gw',),               lambda c: ('red', '--' if 'sup' in c else ':')),
+    (('otros',),                       lambda c: ('darkorange', '-' if 'lim_inf' in c else '--')),
+]
+
+# Se resuelve una sola vez por nombre de columna, igual que get_legend_label
+@functools.lru_cache(maxsize=512)
+def get_limit_style(col_name):
+    col_lower = col_name.lower()
+    for keys, style in LIMIT_STYLE_RULES:
+        if any(key in col_lower for key in keys):
+            return style(col_lower)
+    return 'black', '-'
+
 def create_chart(df, parameter, selected_columns=None, date_angle=-90, date_format="MM-YY", x_label_count=0, legend_position="right", symbol_style="circle", legend_size=7.0, legend_cols=5, symbol_size=3.0, legend_spacing=0.2, log_scale=False, custom_otros_name="Otros", custom_line_styles=None):
     
-    # Filtrar datos
-    subset = df[df['parametro'] == parameter].copy()
+    # Columnas de normativa a dibujar
+    limit_cols = [col for col in df.columns if col.startswith('lim_') or col.startswith('ISQG') or col.startswith('PEL')]
+    if selected_columns is not None:
+        limit_cols = [col for col in limit_cols if col in selected_columns]
+
+    # Filtrar datos: solo las filas del parámetro y las columnas que usa el gráfico
+    # (sin .copy() de todas las columnas de la tabla unida)
+    used_cols = [col for col in ('fecha', 'estacion', 'valor_num', 'valor', 'unidad') if col in df.columns]
+    subset = df.loc[df['parametro'] == parameter, used_cols + limit_cols]
     if subset.empty:
         return None
     
-    # Asegurar que 'fecha' sea formato datetime
-    subset['fecha'] = pd.to_datetime(subset['fecha'])
-    unit = subset['unidad'].iloc[0] if 'unidad' in subset.columns else ""
+    # Asegurar que 'fecha' sea formato datetime (clean_data ya la convierte una vez al cargar)
+    if not pd.api.types.is_datetime64_any_dtype(subset['fecha']):
+        subset = subset.assign(fecha=pd.to_datetime(subset['fecha']))
+    unit = subset['unidad'].iat[0] if 'unidad' in subset.columns else ""
     
     # --- CONFIGURACIÓN GLOBAL DE FUENTES ---
-    plt.rcParams['font.family'] = custom_font_name
-    if custom_font_name == 'serif':
-        plt.rcParams['font.serif'] = ['Bookman Old Style', 'Times New Roman', 'serif']
-        
-    plt.rcParams['font.size'] = 9
-    
-    # NUEVO: Obligar al texto matemático a usar la fuente normal (Bookman Old Style)
-    plt.rcParams['mathtext.fontset'] = 'custom'
-    plt.rcParams['mathtext.bf']  = f'{custom_font_name}:bold'
-    plt.rcParams['mathtext.bfit'] = f'{custom_font_name}:bold:italic'  # <-- clave
-    plt.rcParams['mathtext.it']  = f'{custom_font_name}:italic'
-    plt.rcParams['mathtext.rm']  = custom_font_name
-    
-    plt.rcParams['axes.edgecolor'] = 'black'        
-    plt.rcParams['axes.linewidth'] = 1.0            
-    plt.rcParams['axes.spines.top'] = True          
-    plt.rcParams['axes.spines.right'] = True        
-    plt.rcParams['axes.spines.bottom'] = True       
-    plt.rcParams['axes.spines.left'] = True         
+    plt.rcParams.update(BASE_RC_PARAMS)
     
     # Crear Figura
     fig, ax = plt.subplots(figsize=(15.5 / 2.54, 8 / 2.54))
     
-    # --- DICCIONARIO DE FORMAS Y COLORES ---
-    marker_configs = [
-        ('o', True),  ('s', True),  ('D', True),  ('^', True),  ('p', True),
-        ('h', True),  ('*', True),  ('v', True),  ('<', True),  ('>', True), 
-        ('X', True),  ('d', True),  ('P', True),  ('H', True),  ('8', True),
-        
-        ('o', False), ('s', False), ('D', False), ('^', False), ('p', False),
-        ('h', False), ('*', False), ('v', False), ('<', False), ('>', False),
-        ('X', False), ('d', False), ('P', False), ('H', False), ('8', False),
-        
-        ('+', True),  ('x', True),  ('|', True),  ('_', True),  ('1', True),
-        ('2', True),  ('3', True),  ('4', True)
-    ]
-    
-    colors = [
-        '#e6194b', '#3cb44b', '#ffe119', '#4363d8', '#f58231', 
-        '#911eb4', '#42d4f4', '#f032e6', '#7fff00', '#fabed4', 
-        '#469990', '#dcbeff', '#9a6324', '#4b0082', '#800000', 
-        '#aaffc3', '#808000', '#ffd8b1', '#000075', '#a9a9a9', 
-        '#333333', '#ffd700', '#ff7f50', '#87ceeb', '#a87858', 
-        '#ff69b4', '#dda0dd', '#40e0d0', '#d2691e', '#4682b4', 
-        '#7fff00', '#4b0082', '#04bbfc'
-    ]
-    
     # 1. Trazar las Estaciones
-    stations = subset['estacion'].unique()
-    for i, station in enumerate(stations):
-        station_data = subset[subset['estacion'] == station]
-        c = colors[i % len(colors)]
+    rasterize_points = len(subset) > MAX_VECTOR_POINTS
+    # Un solo groupby (en orden de aparición) en lugar de una máscara por estación
+    for i, (station, station_data) in enumerate(subset.groupby('estacion', sort=False, observed=True)):
+        c = STATION_COLORS[i % len(STATION_COLORS)]
         
         if symbol_style == "varied":
-            m_shape, is_filled = marker_configs[i % len(marker_configs)]
+            m_shape, is_filled = MARKER_CONFIGS[i % len(MARKER_CONFIGS)]
             mfc = c if is_filled else 'none'
             
             ax.plot(station_data['fecha'], station_data.get('valor_num', station_data['valor']),
                     marker=m_shape, linestyle='', color=c, 
                     markerfacecolor=mfc, markeredgecolor=c,
-                    label=station, markersize=symbol_size)
+                    label=station, markersize=symbol_size,
+                    rasterized=rasterize_points)
         else:
             ax.plot(station_data['fecha'], station_data.get('valor_num', station_data['valor']),
                     marker='o', linestyle='', color=c, 
                     markerfacecolor=c, markeredgecolor=c,
-                    label=station, markersize=symbol_size)
+                    label=station, markersize=symbol_size,
+                    rasterized=rasterize_points)
 
     # 2. Trazar Líneas de Normativa
-    limit_cols = [col for col in df.columns if col.startswith('lim_') or col.startswith('ISQG') or col.startswith('PEL')]
-    if selected_columns is not None:
-        limit_cols = [col for col in limit_cols if col in selected_columns]
+    # Las líneas de normativa se juntan en una sola LineCollection (un artista en
+    # lugar de un axhline por límite); la leyenda usa una línea sin datos por límite.
+    limit_values, limit_colors, limit_styles, limit_widths, limit_handles = [], [], [], [], []
 
-    def get_legend_label(col_name, single_line=True):
-        if 'lim_inf_' in col_name:
-            prefix, clean_col = ("L.inf." if single_line else "Lím. inf."), col_name.replace('lim_inf_', '')
-        elif 'lim_sup_' in col_name:
-            prefix, clean_col = ("L.sup." if single_line else "Lím. sup."), col_name.replace('lim_sup_', '')
-        else:
-            prefix, clean_col = ("L." if single_line else "Lím."), col_name.replace('lim_', '')
-            
-        parts = clean_col.split('_')
-        
-        if parts[0] == 'lga':
-            reg_body, category = "LGA", (f"C.{parts[1]}" if single_line else f"Cat. {parts[1]}")
-        elif parts[0] == 'eca':
-            year, cat_raw = parts[1], "_".join(parts[2:])
-            reg_body = f"ECA-{year[-2:]}" if single_line else f"ECA-{year}"
-            suffix_desc = " costa y sierra" if cat_raw.endswith("_cys") else (" selva" if cat_raw.endswith("_s") else (" estuario" if cat_raw.endswith("_e") else (" mar" if cat_raw.endswith("_m") else "")))
-            for suffix in ["_cys", "_s", "_e", "_m"]:
-                cat_raw = cat_raw.replace(suffix, "")
-            
-            if len(cat_raw) >= 3 and cat_raw[0].isdigit():
-                code = f"{cat_raw[0]}-{cat_raw[1:].upper()}"
-                category = f"{code}{suffix_desc}" if single_line else f"Cat. {code}{suffix_desc}"
-            else:
-                category = f"{cat_raw.upper()}{suffix_desc}" if single_line else f"Cat. {cat_raw.upper()}{suffix_desc}"
-        elif parts[0] == 'nmp':
-            reg_body, category = "NMP", ("Min-96" if single_line else " ".join(parts[1:]).replace("_", " ").lower())
-        elif parts[0] == 'lmp':
-            reg_body = f"LMP-{parts[1][-2:]}" if single_line else f"LMP {parts[1]}"
-            category = "Dom" if "domestico" in col_name else ("Min" if "minero" in col_name else " ".join(parts[2:]).replace("_", " ").lower())
-        elif 'ISQG' in col_name or 'PEL' in col_name:
-            reg_body = parts[0]
-            category = "Fresh" if "freshwater" in col_name else ("Mar" if "marine" in col_name else " ".join(parts[1:]).capitalize())
-            return f"{reg_body} {category}" if single_line else f"{reg_body}\n{category}"
-        elif 'referencia_gw' in col_name:
-            reg_body = "Valor Referencial"
-            category = "Promedio + 2 Desv. Est." if 'sup' in col_name else "Promedio - 2 Desv. Est."
-            return "Ref. Prom+2DE" if single_line and 'sup' in col_name else ("Ref. Prom-2DE" if single_line else f"{reg_body}\n{category}")
-        # NUEVA REGLA PARA OTROS
-        elif 'otros' in clean_col.lower():
-            reg_body = custom_otros_name
-            return f"{prefix} {reg_body}"
-        else:
-            reg_body, category = parts[0].upper(), " ".join(parts[1:]).upper()
-
-        separator = " " if single_line else "\n"
-        return f"{prefix} {reg_body}{separator}{category}"
+    # Los límites son constantes por parámetro: se leen todos de la primera fila de una vez
+    limits_row = subset[limit_cols].iloc[0].to_dict()
 
-    for col in limit_cols:
-        val = subset[col].iloc[0]
-        if pd.notna(val):
-            label = get_legend_label(col, single_line=True)
+    for col, val in limits_row.items():
+        if val is not None and val == val: # NaN != NaN: descarta vacíos sin pasar por pd.notna
+            label = get_legend_label(col, single_line=True, custom_otros_name=custom_otros_name)
             
-            col_lower, color, linestyle, alpha, lw = col.lower(), 'black', '-', 1.0, 1.5
-            
-            if 'eca_2017_3d2' in col_lower:
-                color, linestyle = 'blue', ('--' if 'lim_inf' in col_lower else '-')
-            elif 'eca_2017' in col_lower:
-                color, linestyle = 'red', ('-' if 'lim_inf' in col_lower else '--')
-            elif 'lga' in col_lower or 'eca_2008' in col_lower or 'eca_2015' in col_lower:
-                color, linestyle = 'green', (':' if 'lim_inf' in col_lower else '-.')
-                if 'eca_2015_3d2' in col_lower:
-                    color = 'blue'
-            elif 'nmp_minero' in col_lower:
-                color, linestyle = 'purple', ('-.' if 'lim_inf' in col_lower else ':')
-            elif 'lmp_2010' in col_lower:
-                color = 'green' if 'domestico' in col_lower else 'red'
-                linestyle = ':' if 'lim_inf' in col_lower and 'domestico' in col_lower else ('-' if 'domestico' in col_lower else ('-' if 'lim_inf' in col_lower else '--'))
-            elif 'isqg' in col_lower or 'pel' in col_lower:
-                color, linestyle = ('purple' if 'isqg' in col_lower else 'red'), '-.'
-            elif 'referencia_gw' in col_lower:
-                color, linestyle = 'red', ('--' if 'sup' in col_lower else ':')
-            elif 'otros' in col_lower:
-                color, linestyle = 'darkorange', ('-' if 'lim_inf' in col_lower else '--')
+            color, linestyle = get_limit_style(col)
+            alpha, lw = 1.0, 1.5
 
             # --- NUEVA LÓGICA: SOBRESCRIBIR SI EL USUARIO ELIGIÓ UN COLOR/ESTILO ---
             if custom_line_styles is not None and col in custom_line_styles:
@@ -182,7 +215,18 @@ def create_chart(df, parameter, selected_columns=None, date_angle=-90, date_form
                 linestyle = custom_line_styles[col]['linestyle']
             # -----------------------------------------------------------------------
 
-            ax.axhline(y=val, color=color, linestyle=linestyle, alpha=alpha, label=label, linewidth=lw)
+            limit_values.append(val)
+            limit_colors.append(color)
+            limit_styles.append(linestyle)
+            limit_widths.append(lw)
+            limit_handles.append(Line2D([], [], color=color, linestyle=linestyle, alpha=alpha, label=label, linewidth=lw))
+
+    if limit_values:
+        # Eje x en fracción del gráfico (0 a 1) y eje y en datos, igual que axhline
+        ax.add_collection(LineCollection([[(0, v), (1, v)] for v in limit_values],
+                                         colors=limit_colors, linestyles=limit_styles, linewidths=limit_widths,
+                                         transform=ax.get_yaxis_transform()), autolim=False)
+        ax.update_datalim([(0, v) for v in limit_values], updatex=False)
 
     # 3. Formato de Ejes
     # --- CONVERSIÓN DE SUBÍNDICES MATEMÁTICO ---
@@ -217,14 +261,12 @@ def create_chart(df, parameter, selected_columns=None, date_angle=-90, date_form
     else:
         ax.grid(True, which='both', axis='both', color='gray', linestyle='--', linewidth=0.5, alpha=0.5)
     
-    spanish_months = {1: 'Ene', 2: 'Feb', 3: 'Mar', 4: 'Abr', 5: 'May', 6: 'Jun', 7: 'Jul', 8: 'Ago', 9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dic'}
-    
     def span_date_fmt(x, pos):
         dt = mdates.num2date(x)
         if date_format == "DD-MM-YY":
-            return f"{dt.day}-{spanish_months[dt.month]}-{str(dt.year)[-2:]}"
+            return f"{dt.day}-{SPANISH_MONTHS[dt.month]}-{dt.year % 100:02d}"
         else:
-            return f"{spanish_months[dt.month]}-{str(dt.year)[-2:]}"
+            return f"{SPANISH_MONTHS[dt.month]}-{dt.year % 100:02d}"
     
     ax.xaxis.set_major_formatter(plt.FuncFormatter(span_date_fmt))
     
@@ -239,15 +281,32 @@ def create_chart(df, parameter, selected_columns=None, date_angle=-90, date_form
     ax.spines['right'].set_visible(True)
     
     # 4. LA LEYENDA
+    legend_handles = ax.get_legend_handles_labels()[0] + limit_handles
     if legend_position == "bottom":
-        ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.25),
+        ax.legend(handles=legend_handles, loc='upper center', bbox_to_anchor=(0.5, -0.25),
                   ncol=legend_cols, fontsize=legend_size, frameon=False,
                   labelspacing=legend_spacing, handletextpad=0.3, columnspacing=0.8)
     else: 
-        ax.legend(loc='upper left', bbox_to_anchor=(1.02, 1),
+        ax.legend(handles=legend_handles, loc='upper left', bbox_to_anchor=(1.02, 1),
                   ncol=1, fontsize=legend_size, frameon=False,
                   labelspacing=legend_spacing, handletextpad=0.3)
                   
     plt.tight_layout()
     
     return fig
+
+def render_chart_image(df, parameter, image_format="png", dpi=300, **chart_kwargs):
+    """
+    Dibuja el gráfico de un parámetro y lo devuelve como bytes de imagen ('png' o 'svg'),
+    o None si no hay datos.
+    """
+    fig = create_chart(df, parameter, **chart_kwargs)
+    if fig is None:
+        return None
+
+    img_buffer = io.BytesIO()
+    fig.savefig(img_buffer, format=image_format, dpi=dpi, bbox_inches='tight', pad_inches=0.1)
+
+    plt.close(fig) # Liberar memoria
+
+    return img_buffer.getvalue()
@@ -1,13 +1,23 @@
 import pandas as pd
 
 
+def _open_excel(file):
+    """
+    Opens the workbook with the Rust-based calamine engine (much faster than
+    openpyxl). Falls back to openpyxl if python-calamine is not installed.
+    """
+    try:
+        return pd.ExcelFile(file, engine="calamine")
+    except ImportError:
+        return pd.ExcelFile(file, engine="openpyxl")
+
 def load_data(file):
     """
     Loads data from the uploaded Excel file.
     Expects sheets 'datos' and 'eca'.
     """
     try:
-        xls = pd.ExcelFile(file)
+        xls = _open_excel(file)
         if "datos" not in xls.sheet_names:
              return None, "Error: El archivo debe contener la hoja 'datos'."
              
@@ -43,26 +53,32 @@ def clean_data(df):
     mask_less = s_values.str.contains('<', na=False)
     
     df['es_LD'] = mask_less
-    df['valor_num'] = float('nan')
     
-    if mask_less.any():
-        clean_values = s_values.loc[mask_less].str.replace('<', '', regex=False)
-        numeric_values = pd.to_numeric(clean_values, errors='coerce')
-        df.loc[mask_less, 'valor_num'] = numeric_values / 2.0
-        
-    # Ahora la conversión es directa porque ya no hay comas. 
-    # (Se eliminó la línea redundante que sobrescribía la limpieza)
-    df.loc[~mask_less, 'valor_num'] = pd.to_numeric(s_values.loc[~mask_less], errors='coerce')
+    # Ahora la conversión es directa porque ya no hay comas: se quita el '<' de toda
+    # la columna y se convierte una sola vez; los valores bajo el LD van a la mitad.
+    clean_values = s_values.str.replace('<', '', regex=False)
+    valor_num = pd.to_numeric(clean_values, errors='coerce').astype('float64')
+    valor_num = valor_num.mask(mask_less, valor_num / 2.0)
     
-    df['valor_num'] = pd.to_numeric(df['valor_num'], errors='coerce')
+    df['valor_num'] = valor_num
     df = df.dropna(subset=['valor_num'])
     
     # Create 'parametro_unidad'
     df['parametro_unidad'] = df['parametro'].astype(str) + " (" + df['unidad'].astype(str) + ")"
     
     # Ensure fecha is datetime
-    df['fecha'] = pd.to_datetime(df['fecha'], errors='coerce')
-    
+    # (Excel dates already arrive as datetime64; only text dates need parsing)
+    if not pd.api.types.is_datetime64_any_dtype(df['fecha']):
+        df['fecha'] = pd.to_datetime(df['fecha'], errors='coerce')
+
+    # Pocas estaciones repetidas en muchas filas: como 'category' se guardan
+    # códigos enteros en lugar de un objeto Python por fila.
+    # Texto en cadenas Arrow: st.dataframe las envía al navegador sin convertir
+    # objetos Python, y estaciones mixtas (ej. 1110 y 'PZ-4A') quedan todas como texto.
+    for col in ('parametro', 'unidad'):
+        df[col] = df[col].astype('string[pyarrow]')
+    df['estacion'] = df['estacion'].astype('string[pyarrow]').astype('category')
+
     return df
 
 def merge_data(df_datos, df_eca):
@@ -80,11 +96,8 @@ def get_regulation_columns(df):
     Dynamically identifies regulation columns (limits).
     Assumes they start with 'lim_'.
     """
-    cols = []
-    for col in df.columns:
-        if col.startswith('lim_') or col.startswith('ISQG') or col.startswith('PEL'):
-            cols.append(col)
-    return cols
+    cols = df.columns
+    return cols[cols.str.startswith(('lim_', 'ISQG', 'PEL'), na=False)].tolist()
 
 def get_regulation_groups(df):
     """
@@ -129,20 +142,13 @@ def get_regulation_groups(df):
         
     return groups
 
-def calculate_reference_statistics(df, method='mean_plus_2std'):
+def calculate_reference_statistics_by_parameter(df):
     """
-    Calculates the reference value based on the selected method.
-    Options: 'mean_plus_2std' (Mean + 2*Std), 'mean_minus_2std' (Mean - 2*Std)
+    Reference values of every parameter at once: Mean + 2*Std and Mean - 2*Std.
+    Returns two Series (upper, lower) aligned with df, holding the values of each row's parameter.
     """
-    if df.empty:
-        return None
-        
-    mean_val = df['valor_num'].mean()
-    std_val = df['valor_num'].std(ddof=1) # Sample standard deviation
-    
-    if method == 'mean_minus_2std':
-        return mean_val - (2 * std_val)
-    else:
-        return mean_val + (2 * std_val)
-
+    grouped = df.groupby('parametro', observed=True)['valor_num']
+    mean_val = grouped.transform('mean')
+    std_val = grouped.transform('std') # Sample standard deviation (ddof=1)
 
+    return mean_val + (2 * std_val), mean_val - (2 * std_val)
@@ -8,6 +8,10 @@ def format_number(val):
     # Formateo nativo %g reemplazando el punto por coma decimal
     return ("%g" % val).replace('.', ',')
 
+def format_percent(val):
+    # Porcentaje redondeado a 2 decimales, con coma decimal
+    return ("%g" % round(val, 2)).replace('.', ',')
+
 def format_promedio_dinamico(val):
     """
     Da formato al valor promedio siguiendo reglas específicas de cifras significativas:
@@ -61,9 +65,13 @@ def obtener_estaciones_extremo(grupo, columna_valor, tipo="max"):
     
     val_extremo = grupo[columna_valor].max() if tipo == "max" else grupo[columna_valor].min()
     
+    # Solo se filtra la columna de estaciones (no todo el grupo, que trae todas las
+    # columnas de normativa) con una máscara NumPy sobre los valores
+    es_extremo = grupo[columna_valor].to_numpy() == val_extremo
+    
     # CORRECCIÓN: Convertimos explícitamente a str cada estación para evitar fallas si son números
     estaciones = [
-        str(est) for est in grupo[grupo[columna_valor] == val_extremo]['estacion'].dropna().unique()
+        str(est) for est in grupo['estacion'][es_extremo].dropna().unique()
     ]
     
     if not estaciones:
@@ -77,23 +85,49 @@ def obtener_estaciones_extremo(grupo, columna_valor, tipo="max"):
         # Para 3 o más estaciones: "X, Y y Z" sin importar si originalmente eran números
         return f" (estaciones {', '.join(estaciones[:-1])} y {estaciones[-1]})"
 
+def contar_fuera_de_rango(valores, lim_inf=None, lim_sup=None):
+    """
+    Cuenta los valores por debajo del límite inferior o por encima del superior.
+    Los límites vacíos (None/NaN) no se comparan.
+    """
+    # Un límite vacío se reemplaza por -inf/+inf: la comparación es siempre la misma
+    # y nunca cuenta ese lado, sin ramas por cada límite
+    lim_inf = float(lim_inf) if pd.notna(lim_inf) else -np.inf
+    lim_sup = float(lim_sup) if pd.notna(lim_sup) else np.inf
+    return int(np.count_nonzero((valores < lim_inf) | (valores > lim_sup)))
+
+def redactar_comparacion(inicio, referencia, lim_fmt, unidad, n_inc, n_total, norma):
+    """
+    Arma la oración de comparación con una normativa según cuántos registros
+    no la cumplen (ninguno, todos o una parte con su porcentaje).
+    """
+    texto = f"{inicio} comparar los resultados obtenidos con {referencia} ({lim_fmt} {unidad}), se observa que "
+    if n_inc == 0:
+        return texto + f"todos los registros cumplen con el {norma}."
+    elif n_inc == n_total:
+        return texto + f"todos los registros no cumplen con el {norma}."
+    return texto + f"{n_inc} ({format_percent(100 * n_inc / n_total)} %) de los registros no cumplen con el valor establecido."
+
 def get_base_statistics_text(grupo, grafico_label="Gráfico XXX"):
     """
     Calcula las estadísticas base de un parámetro e incluye las estaciones
     del valor máximo y mínimo entre paréntesis al costado de cada valor.
     """
-    param = grupo["parametro"].iloc[0]
-    unidad = grupo["unidad"].iloc[0]
-    es_LD_list = grupo["es_LD"].tolist()
-    valores_numericos = grupo["valor_num"].tolist()
+    param = grupo["parametro"].iat[0]
+    unidad = grupo["unidad"].iat[0]
+    es_LD = grupo["es_LD"].to_numpy(dtype=bool)
+    # Reducciones directamente sobre el arreglo NumPy (sin pasar por una lista de Python);
+    # el mismo arreglo float64 se devuelve para las comparaciones con los límites
+    valores_numericos = grupo["valor_num"].to_numpy(dtype=np.float64)
     
     # Extraer valores unicos de LD (<LD) formateando comas
-    ld_unicos = sorted(list(set([str(v).replace(".", ",") for v in grupo.loc[grupo['es_LD'], 'valor']])))
+    # (se eliminan duplicados antes de formatear: solo se recorren los textos distintos)
+    ld_unicos = sorted(grupo["valor"][es_LD].drop_duplicates().astype(str).str.replace(".", ",", regex=False))
     
-    if valores_numericos:
-        minimo = min(valores_numericos)
-        maximo = max(valores_numericos)
-        promedio = sum(valores_numericos) / len(valores_numericos)
+    if valores_numericos.size:
+        minimo = valores_numericos.min()
+        maximo = valores_numericos.max()
+        promedio = valores_numericos.mean()
         
         # Obtener las estaciones correspondientes a los extremos
         estaciones_max = obtener_estaciones_extremo(grupo, 'valor_num', tipo='max')
@@ -107,44 +141,62 @@ def get_base_statistics_text(grupo, grafico_label="Gráfico XXX"):
     else:
         min_t, max_t, prom_t = "NaN", "NaN", "NaN"
     
-    if all(es_LD_list):
+    if es_LD.all():
         resumen = f"se encontraron por debajo del límite de detección ({', '.join(ld_unicos)} {unidad})"
-    elif not any(es_LD_list):
+    elif not es_LD.any():
         resumen = f"variaron desde un mínimo igual a {min_t} hasta un máximo igual a {max_t}, contando con un valor promedio de {prom_t}"
     else:
         resumen = f"variaron desde por debajo del límite de detección ({', '.join(ld_unicos)} {unidad}) hasta un máximo igual a {max_t}, con un valor promedio de {prom_t}"
 
     return f"Como se observa en el {grafico_label}, los valores de {param} registrados en todas las estaciones {resumen}.", valores_numericos, unidad
 
+def describir_normativa(std, custom_otros_name="Otros"):
+    """
+    Devuelve (slug, título, redacción de referencia, descripción) de una normativa
+    de agua superficial.
+    """
+    slug = std.lower().replace(" ", "_")
+    if std == "Otros":
+        return "otros", custom_otros_name, f"el {custom_otros_name}", ""
+    elif slug.startswith("lga"):
+        return slug, "LGA", f"la LGA para la categoría {std.split()[-1]}", ""
+    else:
+        categoria = std.replace('ECA 2017 ', '').replace('ECA 2015 ', '').replace('ECA 2008 ', '')
+        desc_str = " (conservación del ambiente acuático para ríos)" if "4E2" in std else ""
+        return slug, std, f"el {std} para agua para la categoría {categoria}", desc_str
+
 # =====================================================
 # MULTIMÓDULO: AGUA SUPERFICIAL (ECA)
 # =====================================================
 def generar_texto_superficial(grupo, selected_standards, custom_otros_name="Otros"):
-    texto_base, valores_numericos, unidad = get_base_statistics_text(grupo, "Gráfico XXX")
+    texto_base, valores, unidad = get_base_statistics_text(grupo, "Gráfico XXX")
     texto_list = [texto_base]
-    n_total = len(valores_numericos)
+    n_total = valores.size
     
-    if not selected_standards or not valores_numericos:
+    if not selected_standards or not valores.size:
         return texto_base
 
+    # Todas las filas del parámetro comparten los mismos límites: se leen una sola vez
+    limites = grupo.iloc[0].to_dict()
+    # Varias normativas comparten los mismos límites (ej. ECA 2008 y ECA 2017):
+    # cada par (inferior, superior) se compara contra los valores una sola vez
+    conteos = {}
+
     def check_compliance(lim_inf_col, lim_sup_col):
-        if lim_inf_col not in grupo.columns and lim_sup_col not in grupo.columns:
-            return None
-        lim_inf = grupo[lim_inf_col].iloc[0] if lim_inf_col in grupo.columns else None
-        lim_sup = grupo[lim_sup_col].iloc[0] if lim_sup_col in grupo.columns else None
-        
+        lim_inf = limites.get(lim_inf_col)
+        lim_sup = limites.get(lim_sup_col)
+
         if pd.isna(lim_inf) and pd.isna(lim_sup):
             return None
-        
-        n_inc = 0
-        for v in valores_numericos:
-            if (pd.notna(lim_inf) and v < lim_inf) or (pd.notna(lim_sup) and v > lim_sup):
-                n_inc += 1
-        return n_inc
+
+        clave = (None if pd.isna(lim_inf) else lim_inf, None if pd.isna(lim_sup) else lim_sup)
+        if clave not in conteos:
+            conteos[clave] = contar_fuera_de_rango(valores, lim_inf, lim_sup)
+        return conteos[clave]
 
     def format_limits(lim_inf_col, lim_sup_col):
-        lim_inf = grupo[lim_inf_col].iloc[0] if lim_inf_col in grupo.columns else None
-        lim_sup = group_sup = grupo[lim_sup_col].iloc[0] if lim_sup_col in grupo.columns else None
+        lim_inf = limites.get(lim_inf_col)
+        lim_sup = limites.get(lim_sup_col)
         if pd.notna(lim_inf) and pd.notna(lim_sup):
             return f"{format_number(lim_inf)} a {format_number(lim_sup)}"
         elif pd.notna(lim_sup):
@@ -163,8 +215,8 @@ def generar_texto_superficial(grupo, selected_standards, custom_otros_name="Otro
         if inc1 is None and inc2 is None:
             texto_list.append(f" Cabe mencionar que no existe un ECA 2017 para agua para la categoría 3 – D1 (riego de vegetales) y 3 - D2 (bebida de animales) aplicable para este parámetro.")
         else:
-            porc1 = ("%g" % round(100 * inc1 / n_total, 2)).replace('.', ',') if inc1 is not None else "0"
-            porc2 = ("%g" % round(100 * inc2 / n_total, 2)).replace('.', ',') if inc2 is not None else "0"
+            porc1 = format_percent(100 * inc1 / n_total) if inc1 is not None else "0"
+            porc2 = format_percent(100 * inc2 / n_total) if inc2 is not None else "0"
             
             if inc1 == 0 and inc2 == 0:
                 texto_list.append(f" Al comparar los resultados obtenidos con el ECA 2017 para agua para la categoría 3 – D1 ({lim_fmt1} {unidad}) y 3 - D2 ({lim_fmt2} {unidad}), se observa que todos los registros cumplen con el ECA 2017.")
@@ -180,21 +232,7 @@ def generar_texto_superficial(grupo, selected_standards, custom_otros_name="Otro
 
     # Mapeo estándar para el resto de normativas individuales
     for std in selected_standards:
-        slug = std.lower().replace(" ", "_")
-        if std == "Otros":
-            slug = "otros"
-            std_title = custom_otros_name
-            ref_wording = f"el {custom_otros_name}"
-            desc_str = ""
-        elif slug.startswith("lga"):
-            std_title = "LGA"
-            ref_wording = f"la LGA para la categoría {std.split()[-1]}"
-            desc_str = ""
-        else:
-            std_title = std
-            ref_wording = f"el {std} para agua para la categoría {std.replace('ECA 2017 ', '').replace('ECA 2015 ', '').replace('ECA 2008 ', '')}"
-            desc_str = " (conservación del ambiente acuático para ríos)" if "4E2" in std else ""
-
+        slug, std_title, ref_wording, desc_str = describir_normativa(std, custom_otros_name)
         inf_col = f"lim_inf_{slug}"
         sup_col = f"lim_sup_{slug}"
         
@@ -204,13 +242,7 @@ def generar_texto_superficial(grupo, selected_standards, custom_otros_name="Otro
         if inc is None:
             texto_list.append(f" Cabe mencionar que no existe {ref_wording}{desc_str} aplicable para este parámetro.")
         else:
-            porc = ("%g" % round(100 * inc / n_total, 2)).replace('.', ',')
-            if inc == 0:
-                texto_list.append(f" Al comparar los resultados obtenidos con {ref_wording} ({lim_fmt} {unidad}), se observa que todos los registros cumplen con el {std_title.split()[0]}.")
-            elif inc == n_total:
-                texto_list.append(f" Al comparar los resultados obtenidos con {ref_wording} ({lim_fmt} {unidad}), se observa que todos los registros no cumplen con el {std_title.split()[0]}.")
-            else:
-                texto_list.append(f" Al comparar los resultados obtenidos con {ref_wording} ({lim_fmt} {unidad}), se observa que {inc} ({porc} %) de los registros no cumplen con el valor establecido.")
+            texto_list.append(redactar_comparacion(" Al", ref_wording, lim_fmt, unidad, inc, n_total, std_title.split()[0]))
                 
     return "".join(texto_list)
 
@@ -218,15 +250,16 @@ def generar_texto_superficial(grupo, selected_standards, custom_otros_name="Otro
 # MULTIMÓDULO: AGUA SUBTERRÁNEA
 # =====================================================
 def generar_texto_subterranea(grupo, calc_ref_alto=True, calc_ref_bajo=False):
-    texto_base, valores_numericos, unidad = get_base_statistics_text(grupo, "Gráfico XXX")
+    texto_base, valores, unidad = get_base_statistics_text(grupo, "Gráfico XXX")
     texto_list = [texto_base]
-    n_muestras = len(valores_numericos)
+    n_muestras = valores.size
     
-    if not valores_numericos:
+    if not valores.size:
         return texto_base
         
-    promedio = sum(valores_numericos) / n_muestras
-    desviacion = np.std(valores_numericos, ddof=1) if n_muestras > 1 else 0
+    # Media y desviación sobre el mismo arreglo NumPy, sin recorrerlo en Python
+    promedio = valores.mean()
+    desviacion = valores.std(ddof=1) if n_muestras > 1 else 0
     
     if calc_ref_alto or calc_ref_bajo:
         intro_eca = " Debido a que no se cuenta con un Estándar de Calidad Ambiental (ECA) específico para aguas subterráneas, se estableció como valor de referencia "
@@ -236,15 +269,15 @@ def generar_texto_subterranea(grupo, calc_ref_alto=True, calc_ref_bajo=False):
         if calc_ref_alto:
             ref_alto = promedio + (2 * desviacion)
             partes_intro.append(f"el promedio más dos veces la desviación estándar ({format_number(ref_alto)} {unidad})")
-            n_exc = sum(1 for v in valores_numericos if v > ref_alto)
-            porc_exc = f"{('%g' % round((n_exc/n_muestras)*100, 2))}".replace(".", ",")
+            n_exc = int((valores > ref_alto).sum())
+            porc_exc = format_percent((n_exc/n_muestras)*100)
             res_alto = "todos los registros se encuentran por debajo del valor de referencia alto" if n_exc == 0 else ("la totalidad de los registros exceden el valor de referencia alto" if n_exc == n_muestras else f"{n_exc} ({porc_exc} %) de los registros exceden el valor de referencia alto")
             
         if calc_ref_bajo:
             ref_bajo = promedio - (2 * desviacion)
             partes_intro.append(f"el promedio menos dos veces la desviación estándar ({format_number(ref_bajo)} {unidad})")
-            n_deb = sum(1 for v in valores_numericos if v < ref_bajo)
-            porc_deb = f"{('%g' % round((n_deb/n_muestras)*100, 2))}".replace(".", ",")
+            n_deb = int((valores < ref_bajo).sum())
+            porc_deb = format_percent((n_deb/n_muestras)*100)
             res_bajo = "todos los registros se encuentran por encima del valor de referencia bajo" if n_deb == 0 else ("la totalidad de los registros se encuentran por debajo del valor de referencia bajo" if n_deb == n_muestras else f"{n_deb} ({porc_deb} %) de los registros se encuentran por debajo del valor de referencia bajo")
             
         texto_list.append(intro_eca + " y ".join(partes_intro) + ".")
@@ -262,40 +295,36 @@ def generar_texto_subterranea(grupo, calc_ref_alto=True, calc_ref_bajo=False):
 # MULTIMÓDULO: EFLUENTES (LMP)
 # =====================================================
 def generar_texto_efluentes(grupo, selected_standards):
-    texto_base, valores_numericos, unidad = get_base_statistics_text(grupo, "Gráfico XXX")
+    texto_base, valores, unidad = get_base_statistics_text(grupo, "Gráfico XXX")
     texto_list = [texto_base]
-    n_total = len(valores_numericos)
+    n_total = valores.size
     
-    if not selected_standards or not valores_numericos:
+    if not selected_standards or not valores.size:
         return texto_base
 
-    standards_clean = [s.lower().replace(" ", "_") for s in selected_standards]
+    # Conjunto de claves: cada verificación de normativa es una búsqueda O(1)
+    standards_clean = {s.lower().replace(" ", "_") for s in selected_standards}
+    # Todas las filas del parámetro comparten los mismos límites: se leen una sola vez
+    limites = grupo.iloc[0].to_dict()
     has_prior = False
 
     # 1. NMP MINERO 1996
     if "nmp_minero" in standards_clean:
-        inf = grupo["lim_inf_nmp_minero"].iloc[0] if "lim_inf_nmp_minero" in grupo.columns else None
-        sup = grupo["lim_sup_nmp_minero"].iloc[0] if "lim_sup_nmp_minero" in group.columns else None
+        inf = limites.get("lim_inf_nmp_minero")
+        sup = limites.get("lim_sup_nmp_minero")
         
         if pd.isna(inf) and pd.isna(sup):
             texto_list.append(" Cabe mencionar que no existe un NMP 1996 para efluentes minero-metalúrgicos aplicable para este parámetro.")
         else:
-            n_inc = sum(1 for v in valores_numericos if (pd.notna(inf) and v < inf) or (pd.notna(sup) and v > sup))
-            porc = ("%g" % round(100 * n_inc / n_total, 2)).replace('.', ',')
+            n_inc = contar_fuera_de_rango(valores, inf, sup)
             lim_str = f"{format_number(inf)} a {format_number(sup)}" if pd.notna(inf) and pd.notna(sup) else format_number(sup or inf)
-            
-            if n_inc == 0:
-                texto_list.append(f" Al comparar los resultados obtenidos con el NMP 1996 para efluentes minero-metalúrgicos ({lim_str} {unidad}), se observa que todos los registros cumplen con el NMP.")
-            elif n_inc == n_total:
-                texto_list.append(f" Al comparar los resultados obtenidos con el NMP 1996 para efluentes minero-metalúrgicos ({lim_str} {unidad}), se observa que todos los registros no cumplen con el NMP.")
-            else:
-                texto_list.append(f" Al comparar los resultados obtenidos con el NMP 1996 para efluentes minero-metalúrgicos ({lim_str} {unidad}), se observa que {n_inc} ({porc} %) de los registros no cumplen con el valor establecido.")
+            texto_list.append(redactar_comparacion(" Al", "el NMP 1996 para efluentes minero-metalúrgicos", lim_str, unidad, n_inc, n_total, "NMP"))
         has_prior = True
 
     # 2. LMP MINERO 2010
     if "lmp_2010_minero" in standards_clean:
-        inf = grupo["lim_inf_lmp_2010_minero"].iloc[0] if "lim_inf_lmp_2010_minero" in grupo.columns else None
-        sup = grupo["lim_sup_lmp_2010_minero"].iloc[0] if "lim_sup_lmp_2010_minero" in grupo.columns else None
+        inf = limites.get("lim_inf_lmp_2010_minero")
+        sup = limites.get("lim_sup_lmp_2010_minero")
         
         connector = " Por otro lado, no " if has_prior else " No "
         word_comp = "al" if has_prior else "Al"
@@ -303,39 +332,25 @@ def generar_texto_efluentes(grupo, selected_standards):
         if pd.isna(inf) and pd.isna(sup):
             texto_list.append(f"{connector.lower()}existe un LMP 2010 para efluentes minero-metalúrgicos (valor en cualquier momento) aplicable para este parámetro.")
         else:
-            n_inc = sum(1 for v in valores_numericos if (pd.notna(inf) and v < inf) or (pd.notna(sup) and v > sup))
-            porc = ("%g" % round(100 * n_inc / n_total, 2)).replace('.', ',')
+            n_inc = contar_fuera_de_rango(valores, inf, sup)
             lim_str = f"{format_number(inf)} a {format_number(sup)}" if pd.notna(inf) and pd.notna(sup) else format_number(sup or inf)
             prefix = " Por otro lado, al" if has_prior else " Al"
-            
-            if n_inc == 0:
-                texto_list.append(f"{prefix} comparar los resultados obtenidos con el LMP 2010 para efluentes minero-metalúrgicos ({lim_str} {unidad}), se observa que todos los registros cumplen con el LMP.")
-            elif n_inc == n_total:
-                texto_list.append(f"{prefix} comparar los resultados obtenidos con el LMP 2010 para efluentes minero-metalúrgicos ({lim_str} {unidad}), se observa que todos los registros no cumplen con el LMP.")
-            else:
-                texto_list.append(f"{prefix} comparar los resultados obtenidos con el LMP 2010 para efluentes minero-metalúrgicos ({lim_str} {unidad}), se observa que {n_inc} ({porc} %) de los registros no cumplen con el valor establecido.")
+            texto_list.append(redactar_comparacion(prefix, "el LMP 2010 para efluentes minero-metalúrgicos", lim_str, unidad, n_inc, n_total, "LMP"))
         has_prior = True
 
     # 3. LMP DOMÉSTICO 2010
     if "lmp_2010_domestico" in standards_clean:
-        inf = grupo["lim_inf_lmp_2010_domestico"].iloc[0] if "lim_inf_lmp_2010_domestico" in grupo.columns else None
-        sup = grupo["lim_sup_lmp_2010_domestico"].iloc[0] if "lim_sup_lmp_2010_domestico" in grupo.columns else None
+        inf = limites.get("lim_inf_lmp_2010_domestico")
+        sup = limites.get("lim_sup_lmp_2010_domestico")
         
         prefix = " Por otro lado, no " if has_prior else " No "
         if pd.isna(inf) and pd.isna(sup):
             texto_list.append(f"{prefix}existe un valor en los LMP 2010 para efluentes domésticos o municipales aplicable para este parámetro.")
         else:
-            n_inc = sum(1 for v in valores_numericos if (pd.notna(inf) and v < inf) or (pd.notna(sup) and v > sup))
-            porc = ("%g" % round(100 * n_inc / n_total, 2)).replace('.', ',')
+            n_inc = contar_fuera_de_rango(valores, inf, sup)
             lim_str = f"{format_number(inf)} a {format_number(sup)}" if pd.notna(inf) and pd.notna(sup) else format_number(sup or inf)
             prefix_comp = " Por otro lado, al" if has_prior else " Al"
-            
-            if n_inc == 0:
-                texto_list.append(f"{prefix_comp} comparar los resultados obtenidos con el LMP 2010 para efluentes domésticos o municipales ({lim_str} {unidad}), se observa que todos los registros cumplen con el LMP.")
-            elif n_inc == n_total:
-                texto_list.append(f"{prefix_comp} comparar los resultados obtenidos con el LMP 2010 para efluentes domésticos o municipales ({lim_str} {unidad}), se observa que todos los registros no cumplen con el LMP.")
-            else:
-                texto_list.append(f"{prefix_comp} comparar los resultados obtenidos con LMP 2010 para efluentes domésticos o municipales ({lim_str} {unidad}), se observa que {n_inc} ({porc} %) de los registros no cumplen con el valor establecido.")
+            texto_list.append(redactar_comparacion(prefix_comp, "el LMP 2010 para efluentes domésticos o municipales", lim_str, unidad, n_inc, n_total, "LMP"))
 
     return "".join(texto_list)
 
@@ -343,36 +358,41 @@ def generar_texto_efluentes(grupo, selected_standards):
 # MULTIMÓDULO: SEDIMENTOS (CCME)
 # =====================================================
 def generar_texto_sedimentos(grupo, selected_standards):
-    texto_base, valores_numericos, unidad = get_base_statistics_text(grupo, "Gráfico XXX")
+    texto_base, valores, unidad = get_base_statistics_text(grupo, "Gráfico XXX")
     texto_list = [texto_base]
     
-    if not selected_standards or not valores_numericos:
+    if not selected_standards or not valores.size:
         return texto_base
 
     # Detectar el sufijo según la selección
-    is_fresh = any("freshwater" in c.lower() or "fresh" in c.lower() for c in selected_standards)
+    is_fresh = any("fresh" in c.lower() for c in selected_standards)
     suffix = "freshwater" if is_fresh else "marine"
     tipo_env = "sedimentos de agua dulce" if is_fresh else "sedimentos marinos"
     
-    val_isqg = grupo[f"ISQG_{suffix}"].iloc[0] if f"ISQG_{suffix}" in grupo.columns else np.nan
-    val_pel = grupo[f"PEL_{suffix}"].iloc[0] if f"PEL_{suffix}" in grupo.columns else np.nan
+    limites = grupo.iloc[0].to_dict()
+    val_isqg = limites.get(f"ISQG_{suffix}", np.nan)
+    val_pel = limites.get(f"PEL_{suffix}", np.nan)
+
+    # Ambos límites se comparan en una sola pasada: (n valores x 2 límites) -> 2 conteos
+    # (un límite vacío compara como NaN y su conteo no se usa)
+    limites_ccme = np.array([val_isqg, val_pel], dtype=np.float64)
+    n_exc_isqg, n_exc_pel = (valores[:, None] > limites_ccme).sum(axis=0).tolist()
     
-    def comparar_ccme(val_limite, nombre_limite):
+    def comparar_ccme(val_limite, n_exc, nombre_limite):
         if pd.isna(val_limite):
             return f" Cabe mencionar que no existe un {nombre_limite} para {tipo_env} aplicable para este parámetro."
         
-        n_exc = sum(1 for v in valores_numericos if v > val_limite)
-        porc = ("%g" % round((n_exc / len(valores_numericos)) * 100, 2)).replace(".", ",")
+        porc = format_percent((n_exc / valores.size) * 100)
         lim_f = format_number(val_limite)
         
         if n_exc == 0:
             return f" Al comparar los resultados obtenidos con el {nombre_limite} ({lim_f} {unidad}), se observa que todos los registros cumplen con el valor establecido."
-        elif n_exc == len(valores_numericos):
+        elif n_exc == valores.size:
             return f" Al comparar los resultados obtenidos con el {nombre_limite} ({lim_f} {unidad}), se observa que todos los registros exceden el valor establecido."
         else:
             return f" Al comparar los resultados obtenidos con el {nombre_limite} ({lim_f} {unidad}), se observa que {n_exc} ({porc} %) de los registros exceden el valor establecido."
 
-    texto_list.append(comparar_ccme(val_isqg, "ISQG"))
-    texto_list.append(comparar_ccme(val_pel, "PEL"))
+    texto_list.append(comparar_ccme(val_isqg, n_exc_isqg, "ISQG"))
+    texto_list.append(comparar_ccme(val_pel, n_exc_pel, "PEL"))
     
     return "".join(texto_list)